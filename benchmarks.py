@@ -0,0 +1,578 @@
+"""Benchmarks for work_log_db
+
+Each benchmark builds a database of deterministic synthetic entries and
+reports its timings.  Run `python benchmarks.py --help` to list them.
+
+    python3 benchmarks.py run --sizes 10k 100k -o before.json
+    python3 benchmarks.py run --sizes 10k 100k -o after.json
+    python3 benchmarks.py compare before.json after.json
+"""
+import argparse
+import bisect
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import peewee
+import work_log_db
+
+WORDS = [
+    'apples', 'meeting', 'review', 'deploy', 'invoice', 'customer', 'report',
+    'planning', 'support', 'ticket', 'design', 'testing', 'migration',
+    'training', 'budget', 'follow', 'update', 'research', 'call', 'audit',
+]
+
+FIRST_NAMES = [
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael',
+    'Linda', 'William', 'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan',
+    'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen', 'Larry',
+    'Nancy', 'Daniel', 'Lisa', 'Matthew', 'Betty', 'Anthony', 'Margaret',
+    'Mark', 'Sandra', 'Donald', 'Ashley',
+]
+
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller',
+    'Davis', 'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez',
+    'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark',
+    'Ramirez', 'Lewis', 'Robinson', 'Walker', 'Appleton',
+]
+
+# Employees ordered from most to least active, a few log most entries
+EMPLOYEES = [
+    '{} {}'.format(first, last)
+    for last, first in itertools.product(LAST_NAMES, FIRST_NAMES)
+]
+ZIPF_EXPONENT = 1.1
+
+FIRST_DATE = datetime.date(2015, 1, 1)
+LAST_DATE = datetime.date(2024, 12, 31)
+
+SIZES = {'10k': 10000, '100k': 100000, '1M': 1000000, '10M': 10000000}
+
+
+def _zipf_cumulative_weights(count, exponent):
+    """Return cumulative Zipf weights for ranks 1 to count"""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def generate_entries(rows, seed=0):
+    """Yield rows of deterministic synthetic log entries
+
+    Employee names follow a Zipf distribution, dates are working days over
+    ten years, time spent is mostly whole quarter hours and about a third
+    of entries have no notes while the rest have a long tail of lengths.
+    """
+    rng = random.Random(seed)
+    weights = _zipf_cumulative_weights(len(EMPLOYEES), ZIPF_EXPONENT)
+    total = weights[-1]
+    days = (LAST_DATE - FIRST_DATE).days + 1
+    for _ in range(rows):
+        date = FIRST_DATE + datetime.timedelta(days=rng.randrange(days))
+        while date.weekday() >= 5:
+            date = FIRST_DATE + datetime.timedelta(days=rng.randrange(days))
+        if rng.random() < 0.8:
+            time_spent = 15 * rng.randint(1, 32)
+        else:
+            time_spent = rng.randint(1, 600)
+        if rng.random() < 0.35:
+            notes = ''
+        else:
+            length = min(200, int(rng.lognormvariate(2.5, 0.8)))
+            notes = ' '.join(rng.choice(WORDS) for _ in range(length))
+        yield {
+            'employee_name': EMPLOYEES[
+                bisect.bisect(weights, rng.random() * total)],
+            'date': date,
+            'task_name': ' '.join(rng.sample(WORDS, rng.randint(1, 4))),
+            'time_spent': time_spent,
+            'optional_notes': notes,
+        }
+
+
+def build_database(path, rows, seed=0, profile='safe'):
+    """Point work_log_db at a new database at path and fill it with rows"""
+    if os.path.exists(path):
+        os.remove(path)
+    work_log_db.configure(path, profile)
+    work_log_db.initialize()
+    work_log_db.add_entries(generate_entries(rows, seed), batch_size=50000)
+    work_log_db.db.close()
+
+
+def best_time(func, *args, repeat=5, **kwargs):
+    """Return the fastest of repeat calls to func in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_exact_search(args):
+    """Compare exact_search through entry_fts with the LIKE scan"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.db')
+        start = time.perf_counter()
+        build_database(path, args.rows)
+        work_log_db.configure(path)
+        print('Built {:,} rows in {:.1f}s'.format(
+            args.rows, time.perf_counter() - start))
+        if not work_log_db.has_full_text_index():
+            print('SQLite lacks FTS5 trigram support, nothing to compare')
+            return
+
+        print('{:<16}{:>10}{:>12}{:>12}{:>10}'.format(
+            'term', 'matches', 'fts (s)', 'like (s)', 'speedup'))
+        for term in args.terms:
+            matches = len(work_log_db.exact_search(term))
+            fts = best_time(work_log_db.exact_search, term,
+                            repeat=args.repeat)
+            like = best_time(work_log_db.exact_search, term,
+                             full_text=False, repeat=args.repeat)
+            print('{:<16}{:>10,}{:>12.4f}{:>12.4f}{:>9.1f}x'.format(
+                term, matches, fts, like, like / fts))
+        work_log_db.db.close()
+
+
+def bench_pragmas(args):
+    """Compare insert and search throughput of the pragma profiles"""
+    first, last = datetime.date(2016, 1, 1), datetime.date(2016, 1, 31)
+    searches = [
+        ('date_range_search', work_log_db.date_range_search, (first, last)),
+        ('employee_name_search', work_log_db.employee_name_search,
+         (EMPLOYEES[0],)),
+        ('time_spent_search', work_log_db.time_spent_search, (60,)),
+        ('exact_search', work_log_db.exact_search, ('budget audit',)),
+    ]
+    print('{:<22}'.format('') + ''.join(
+        '{:>14}'.format(profile) for profile in args.profiles))
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in args.profiles:
+            path = os.path.join(directory, profile + '.db')
+            start = time.perf_counter()
+            build_database(path, args.rows, profile=profile)
+            work_log_db.configure(path, profile)
+            timings = results[profile] = {
+                'bulk rows/s': args.rows / (time.perf_counter() - start)}
+
+            # One autocommitted transaction per entry, like the menu
+            entries = list(generate_entries(args.single, seed=1))
+            start = time.perf_counter()
+            for entry in entries:
+                work_log_db.add_entry(entry)
+            timings['add_entry rows/s'] = args.single / (
+                time.perf_counter() - start)
+
+            for name, search, search_args in searches:
+                timings[name + '/s'] = 1 / best_time(
+                    search, *search_args, repeat=args.repeat)
+            work_log_db.db.close()
+
+    for measure in results[args.profiles[0]]:
+        print('{:<22}'.format(measure) + ''.join(
+            '{:>14,.0f}'.format(results[profile][measure])
+            for profile in args.profiles))
+
+
+def bench_group_commit(args):
+    """Compare add_entry throughput from many threads with one commit per
+    entry against group commit
+    """
+    entries = list(generate_entries(args.entries, seed=1))
+    print('{:>8}{:>16}{:>16}{:>12}{:>14}'.format(
+        'threads', 'single rows/s', 'group rows/s', 'mean batch',
+        'p99 latency'))
+    with tempfile.TemporaryDirectory() as directory:
+        for threads in args.threads:
+            throughput = {}
+            for group in (False, True):
+                path = os.path.join(directory, 'group.db')
+                build_database(path, 0, profile=args.profile)
+                work_log_db.configure_pool(
+                    path, args.profile, max_connections=threads)
+                if group:
+                    work_log_db.enable_group_commit(
+                        args.max_batch, args.max_delay / 1000)
+                workers = [threading.Thread(
+                    target=lambda part: [
+                        work_log_db.add_entry(entry) for entry in part],
+                    args=(entries[number::threads],))
+                    for number in range(threads)]
+                start = time.perf_counter()
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+                throughput[group] = len(entries) / (
+                    time.perf_counter() - start)
+                stats = work_log_db.group_commit_stats()
+                work_log_db.disable_group_commit()
+                work_log_db.disable_pool()
+            print('{:>8}{:>16,.0f}{:>16,.0f}{:>12.1f}{:>11.1f} ms'.format(
+                threads, throughput[False], throughput[True],
+                stats['mean_batch_size'], stats['p99_latency'] * 1000))
+
+
+def bench_render(args):
+    """Compare the cost per screen of clearing with a clear process and
+    printing against the buffered ANSI rendering of work_log.Screen
+    """
+    import work_log
+    from unittest.mock import patch
+
+    entries = [dict(entry, id=number) for number, entry in enumerate(
+        generate_entries(10, args.seed), 1)]
+    template = ', '.join(work_log.navigator_choices(entries, 1).values())
+
+    def clear_process_screen(count):
+        work_log.system('clear')
+        print(work_log.navigator_template.format(
+            entries[count]['employee_name'], entries[count]['date'],
+            entries[count]['task_name'], entries[count]['time_spent'],
+            entries[count]['optional_notes'], count + 1, len(entries)
+        ), template, sep='')
+        sys.stdout.flush()
+
+    def buffered_screen(count):
+        work_log.clear_screen()
+        work_log.print_navigator_template(
+            work_log.navigator_template, entries, count, template)
+        work_log.screen.flush()
+
+    # Send both the process's and Python's stdout to the null device
+    saved_fd, saved_stdout = os.dup(1), sys.stdout
+    null = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(null, 1)
+    sys.stdout = open(os.devnull, 'w')
+    timings = {}
+    try:
+        with patch.object(work_log.Screen, 'is_terminal', return_value=True):
+            for label, render in [('clear process', clear_process_screen),
+                                  ('buffered ANSI', buffered_screen)]:
+                start = time.perf_counter()
+                for number in range(args.screens):
+                    render(number % len(entries))
+                timings[label] = (time.perf_counter() - start) / args.screens
+    finally:
+        sys.stdout.close()
+        sys.stdout = saved_stdout
+        os.dup2(saved_fd, 1)
+        os.close(saved_fd)
+        os.close(null)
+
+    for label, seconds in timings.items():
+        print('{:<16}{:>12.1f} us/screen'.format(label, seconds * 1e6))
+    print('{:<16}{:>12.0f}x'.format(
+        'speedup', timings['clear process'] / timings['buffered ANSI']))
+
+
+def bench_memory(args):
+    """Compare the memory and time a search returning every entry takes
+    with results built from Entry models copied into dicts and as
+    work_log_db.SearchRow
+    """
+    import tracemalloc
+
+    def entry_dicts():
+        query = work_log_db.search_query().order_by(
+            work_log_db.Entry.date.desc(), work_log_db.Entry.id.desc())
+        return [{
+            'id': entry.id,
+            'employee_name': entry.employee_name,
+            'date': entry.date,
+            'task_name': entry.task_name,
+            'time_spent': entry.time_spent,
+            'optional_notes': entry.optional_notes,
+        } for entry in query]
+
+    def search_rows():
+        return work_log_db.date_range_search(
+            datetime.date.min, datetime.date.max)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'memory.db')
+        build_database(path, args.rows, args.seed)
+        work_log_db.configure(path, 'fast')
+        print('{:<12}{:>14}{:>14}{:>12}'.format(
+            'rows as', 'bytes/row', 'peak/row', 'rows/s'))
+        for label, search in [('Entry+dict', entry_dicts),
+                              ('SearchRow', search_rows)]:
+            tracemalloc.start()
+            results = search()
+            held, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            rows = len(results)
+            del results
+            seconds = best_time(search, repeat=args.repeat)
+            print('{:<12}{:>14,.0f}{:>14,.0f}{:>12,.0f}'.format(
+                label, held / rows, peak / rows, rows / seconds))
+        work_log_db.db.close()
+
+
+def parse_size(text):
+    """Return the number of rows for a size such as 100k or 1M"""
+    if text in SIZES:
+        return SIZES[text]
+    try:
+        return int(text.replace('_', ''))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'sizes are {} or a number of rows'.format(', '.join(SIZES)))
+
+
+def prepare_database(rows, args, directory):
+    """Return the path of a fresh copy of the database with rows entries
+
+    The built database is kept in --data-dir when given so large sizes are
+    only generated once, each run works on a copy so the writes it times
+    never change the data later runs start from.
+    """
+    name = 'entries-{}-seed{}.db'.format(rows, args.seed)
+    path = os.path.join(directory, 'run.db')
+    if not args.data_dir:
+        build_database(path, rows, args.seed, args.profile)
+        return path
+    cached = os.path.join(args.data_dir, name)
+    if not os.path.exists(cached):
+        os.makedirs(args.data_dir, exist_ok=True)
+        build_database(cached + '.partial', rows, args.seed, args.profile)
+        os.replace(cached + '.partial', cached)
+    shutil.copyfile(cached, path)
+    return path
+
+
+def time_calls(calls):
+    """Call each (function, args) pair and return the seconds of each"""
+    timings = []
+    for function, call_args in calls:
+        start = time.perf_counter()
+        function(*call_args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_operations(rows, args):
+    """Time each work_log_db operation on rows entries, return results"""
+    rng = random.Random(args.seed + 1)
+    weekday = FIRST_DATE + datetime.timedelta(days=1000)
+    month = (datetime.date(2020, 3, 1), datetime.date(2020, 3, 31))
+    searches = [
+        ('exact_date_search', work_log_db.exact_date_search, (weekday,)),
+        ('date_range_search', work_log_db.date_range_search, month),
+        ('time_spent_search', work_log_db.time_spent_search, (60,)),
+        ('exact_search', work_log_db.exact_search, ('budget audit',)),
+        ('employee_name_search', work_log_db.employee_name_search,
+         (EMPLOYEES[0],)),
+    ]
+
+    results = []
+    for name, search, search_args in searches:
+        matches = len(search(*search_args))
+        timings = time_calls([(search, search_args)] * args.repeat)
+        results.append((name, timings, matches))
+
+    ids = rng.sample(range(1, rows + 1), min(rows, 2 * args.writes))
+    new_entries = list(generate_entries(args.writes, args.seed + 2))
+    edits = [({'id': entry_id}, entry)
+             for entry_id, entry in zip(ids[:args.writes], new_entries)]
+    deletes = [({'id': entry_id},) for entry_id in ids[args.writes:]]
+    results.append(('add_entry', time_calls(
+        [(work_log_db.add_entry, (entry,)) for entry in new_entries]), None))
+    results.append(('edit_entry', time_calls(
+        [(work_log_db.edit_entry, edit) for edit in edits]), None))
+    results.append(('delete_entry', time_calls(
+        [(work_log_db.delete_entry, delete) for delete in deletes]), None))
+
+    return [{
+        'rows': rows,
+        'operation': name,
+        'calls': len(timings),
+        'matches': matches,
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.mean(timings),
+    } for name, timings, matches in results]
+
+
+def _git_commit():
+    """Return the checked out commit, None outside a git checkout"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_run(args):
+    """Time every work_log_db operation and write the results as JSON"""
+    report = {
+        'meta': {
+            'started': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': sqlite3.sqlite_version,
+            'peewee': peewee.__version__,
+            'profile': args.profile,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'writes': args.writes,
+        },
+        'results': [],
+        # Database file size in bytes by number of rows, before any writes
+        'file_bytes': {},
+    }
+    for rows in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = prepare_database(rows, args, directory)
+            report['file_bytes'][str(rows)] = os.path.getsize(path)
+            work_log_db.configure(path, args.profile)
+            report['results'] += run_operations(rows, args)
+            work_log_db.db.close()
+        print('Finished {:,} rows'.format(rows), file=sys.stderr)
+
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+
+def compare_reports(baseline, candidate, threshold):
+    """Return (rows, operation, baseline s, candidate s, regressed) for
+    each operation timed in both reports, comparing medians
+    """
+    baseline_times = {
+        (result['rows'], result['operation']): result['median_s']
+        for result in baseline['results']}
+    comparison = []
+    for result in candidate['results']:
+        key = (result['rows'], result['operation'])
+        if key not in baseline_times:
+            continue
+        before, after = baseline_times[key], result['median_s']
+        comparison.append(
+            key + (before, after, after > before * (1 + threshold)))
+    return comparison
+
+
+def bench_compare(args):
+    """Flag operations that got slower between two run reports"""
+    with open(args.baseline) as baseline, open(args.candidate) as candidate:
+        baseline, candidate = json.load(baseline), json.load(candidate)
+    comparison = compare_reports(baseline, candidate, args.threshold)
+
+    print('{:>10}  {:<22}{:>14}{:>14}{:>9}'.format(
+        'rows', 'operation', 'baseline (s)', 'candidate (s)', 'change'))
+    regressions = 0
+    for rows, operation, before, after, regressed in comparison:
+        regressions += regressed
+        print('{:>10,}  {:<22}{:>14.6f}{:>14.6f}{:>+8.0%}{}'.format(
+            rows, operation, before, after, after / before - 1,
+            '  REGRESSION' if regressed else ''))
+    print('{} regression(s) over {:.0%}'.format(regressions, args.threshold))
+
+    # Reports from before file sizes were recorded have none
+    sizes = baseline.get('file_bytes', {})
+    for rows, after in candidate.get('file_bytes', {}).items():
+        if rows in sizes:
+            print('{:>10,}  {:<22}{:>14,}{:>14,}{:>+8.0%}'.format(
+                int(rows), 'file bytes', sizes[rows], after,
+                after / sizes[rows] - 1))
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    exact = subparsers.add_parser(
+        'exact-search', help=bench_exact_search.__doc__)
+    exact.add_argument('--rows', type=int, default=1000000)
+    exact.add_argument('--repeat', type=int, default=3)
+    exact.add_argument(
+        '--terms', nargs='+',
+        default=['budget audit', 'nomatch', 'migration', 'apples'])
+    exact.set_defaults(func=bench_exact_search)
+
+    pragmas = subparsers.add_parser('pragmas', help=bench_pragmas.__doc__)
+    pragmas.add_argument('--rows', type=int, default=100000)
+    pragmas.add_argument('--single', type=int, default=500,
+                         help='entries added one transaction at a time')
+    pragmas.add_argument('--repeat', type=int, default=3)
+    pragmas.add_argument(
+        '--profiles', nargs='+', choices=sorted(work_log_db.PRAGMA_PROFILES),
+        default=['safe', 'fast', 'bulk-load'])
+    pragmas.set_defaults(func=bench_pragmas)
+
+    group = subparsers.add_parser(
+        'group-commit', help=bench_group_commit.__doc__)
+    group.add_argument('--entries', type=int, default=2000)
+    group.add_argument('--threads', type=int, nargs='+', default=[1, 8, 64])
+    group.add_argument('--max-batch', type=int, default=500)
+    group.add_argument('--max-delay', type=float, default=1,
+                       help='milliseconds to gather a batch for')
+    group.add_argument(
+        '--profile', choices=sorted(work_log_db.PRAGMA_PROFILES),
+        default='safe')
+    group.set_defaults(func=bench_group_commit)
+
+    render = subparsers.add_parser('render', help=bench_render.__doc__)
+    render.add_argument('--screens', type=int, default=500)
+    render.add_argument('--seed', type=int, default=0)
+    render.set_defaults(func=bench_render)
+
+    memory = subparsers.add_parser('memory', help=bench_memory.__doc__)
+    memory.add_argument('--rows', type=int, default=1000000)
+    memory.add_argument('--seed', type=int, default=0)
+    memory.add_argument('--repeat', type=int, default=3)
+    memory.set_defaults(func=bench_memory)
+
+    run = subparsers.add_parser('run', help=bench_run.__doc__)
+    run.add_argument('--sizes', nargs='+', type=parse_size,
+                     default=[SIZES['10k'], SIZES['100k']],
+                     help='database sizes: {} or a number of rows'.format(
+                         ', '.join(SIZES)))
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--repeat', type=int, default=5,
+                     help='calls timed per search')
+    run.add_argument('--writes', type=int, default=200,
+                     help='calls timed per add, edit and delete')
+    run.add_argument('--profile', default='safe',
+                     choices=sorted(work_log_db.PRAGMA_PROFILES))
+    run.add_argument('--data-dir',
+                     help='keep generated databases here to reuse them')
+    run.add_argument('-o', '--output', default='-',
+                     help="JSON file to write, '-' for stdout (default)")
+    run.set_defaults(func=bench_run)
+
+    compare = subparsers.add_parser('compare', help=bench_compare.__doc__)
+    compare.add_argument('baseline')
+    compare.add_argument('candidate')
+    compare.add_argument('--threshold', type=float, default=0.10,
+                         help='slowdown of the median flagged, 0.10 = 10%%')
+    compare.set_defaults(func=bench_compare)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
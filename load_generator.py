@@ -0,0 +1,170 @@
+"""
+Load generator for work_log_server.py
+
+Opens a number of keep-alive connections to a running server and, on each,
+sends a mix of searches and adds for a while, then reports requests per
+second and latency percentiles per kind of request.
+
+    python3 work_log_server.py --quiet &
+    python3 load_generator.py --connections 16 --duration 30 --add-ratio 0.1
+"""
+import argparse
+import http.client
+import itertools
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+import benchmarks
+
+
+def make_requests(seed, add_ratio):
+    """Yield (kind, method, path, body) requests forever, adds with
+    probability add_ratio and the searches otherwise
+    """
+    rng = random.Random(seed)
+    entries = itertools.cycle(list(benchmarks.generate_entries(1000, seed)))
+    while True:
+        entry = next(entries)
+        date = entry['date'].isoformat()
+        if rng.random() < add_ratio:
+            yield 'add', 'POST', '/entries', json.dumps(
+                dict(entry, date=date))
+            continue
+        kind = rng.choice([
+            'exact_date', 'date_range', 'time_spent', 'exact',
+            'employee_name'])
+        query = {
+            'exact_date': 'date={}'.format(date),
+            'date_range': 'first={}&last={}'.format(
+                date[:8] + '01', date[:8] + '28'),
+            'time_spent': 'minutes={}'.format(entry['time_spent']),
+            'exact': 'term={}'.format(entry['task_name'].split()[0]),
+            'employee_name': 'name={}'.format(
+                entry['employee_name'].split()[0]),
+        }[kind]
+        yield kind, 'GET', '/search/{}?{}&per_page=20'.format(
+            kind, query), None
+
+
+def run_connection(host, port, seed, add_ratio, deadline, latencies,
+                   errors):
+    """Send requests on one keep-alive connection until deadline, adding
+    each latency in seconds to latencies[kind]
+    """
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    requests = make_requests(seed, add_ratio)
+    try:
+        while time.perf_counter() < deadline:
+            kind, method, path, body = next(requests)
+            headers = {'Content-Type': 'application/json'} if body else {}
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                errors.append(kind)
+                connection.close()
+                continue
+            elapsed = time.perf_counter() - started
+            if response.status >= 400:
+                errors.append(kind)
+            else:
+                latencies.setdefault(kind, []).append(elapsed)
+    finally:
+        connection.close()
+
+
+def percentiles(latencies):
+    """Return the p50, p95 and p99 of latencies"""
+    if len(latencies) < 2:
+        return latencies * 3 if latencies else [0.0] * 3
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return cuts[49], cuts[94], cuts[98]
+
+
+def run_load(host='127.0.0.1', port=8080, connections=8, duration=10.0,
+             add_ratio=0.1, seed=0):
+    """Load the server at host:port and return the results, a dict of
+    kind of request (and 'all'): requests, requests_per_second, p50, p95,
+    p99 (seconds) and errors
+    """
+    per_connection = [{} for _ in range(connections)]
+    errors = []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=run_connection, args=(
+            host, port, seed + number, add_ratio, deadline, latencies,
+            errors))
+        for number, latencies in enumerate(per_connection)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    by_kind = {'all': []}
+    for latencies in per_connection:
+        for kind, values in latencies.items():
+            by_kind.setdefault(kind, []).extend(values)
+            by_kind['all'].extend(values)
+    results = {}
+    for kind, values in sorted(by_kind.items()):
+        p50, p95, p99 = percentiles(values)
+        results[kind] = {
+            'requests': len(values),
+            'requests_per_second': len(values) / seconds,
+            'p50': p50,
+            'p95': p95,
+            'p99': p99,
+            'errors': len(errors) if kind == 'all' else errors.count(kind),
+        }
+    return results
+
+
+def format_results(results):
+    """Return report lines for the results of run_load"""
+    lines = ['{:<16}{:>10}{:>10}{:>10}{:>10}{:>10}{:>8}'.format(
+        'request', 'count', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'errors')]
+    for kind, result in results.items():
+        lines.append('{:<16}{:>10,}{:>10,.0f}{:>10.2f}{:>10.2f}{:>10.2f}'
+                     '{:>8,}'.format(
+                         kind, result['requests'],
+                         result['requests_per_second'], result['p50'] * 1000,
+                         result['p95'] * 1000, result['p99'] * 1000,
+                         result['errors']))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Measure the throughput and latency of a running '
+                    'work_log_server.py')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--connections', type=int, default=8,
+                        help='concurrent keep-alive connections')
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='seconds to run for')
+    parser.add_argument('--add-ratio', type=float, default=0.1,
+                        help='share of requests that add an entry')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true',
+                        help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = run_load(args.host, args.port, args.connections, args.duration,
+                       args.add_ratio, args.seed)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print('\n'.join(format_results(results)))
+    return 1 if results['all']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,30 @@
 """This file tests the work_log.py and work_log_db.py files"""
+import asyncio
+import contextlib
 import datetime
+import http.client
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+import benchmarks
+import load_generator
 import work_log
+import work_log_async
+import work_log_cli
 import work_log_db
+import work_log_export
+import work_log_import
+import work_log_server
 from unittest.mock import patch
-from peewee import SqliteDatabase
-from work_log_db import Entry
+from peewee import IntegrityError, OperationalError, SqliteDatabase
+from work_log_db import Employee, Entry
 
 
 test_database = SqliteDatabase(':memory:')
@@ -13,9 +32,10 @@ test_database = SqliteDatabase(':memory:')
 
 class WorkLogUITests(unittest.TestCase):
     def setUp(self):
-        test_database.bind([Entry], bind_refs=False, bind_backrefs=False)
+        test_database.bind(
+            [Entry, Employee], bind_refs=False, bind_backrefs=False)
         test_database.connect()
-        test_database.create_tables([Entry], safe=True)
+        work_log_db.initialize()
 
         # For first log entry
         self.employee_name = 'John Smith'
@@ -168,13 +188,21 @@ class WorkLogUITests(unittest.TestCase):
             "optional_notes": self.optional_notes_5
         }
 
+    def start_from_first_schema(self):
+        """Replace the database setUp made with one holding only the entry
+        table of the first version of work_log_db
+        """
+        test_database.close()
+        test_database.connect()
+        test_database.execute_sql(work_log_db.ENTRY_TABLE_0)
+
     def test_add_entry(self):
         """Test add_entry from work_log_db.py"""
         # No entries in database
 
         # Query database
         result = Entry.select().where(
-            Entry.employee_name == self.employee_name and
+            Employee.name == self.employee_name and
             Entry.date == self.date and
             Entry.task_name == self.task_name and
             Entry.time_spent == self.time_spent and
@@ -195,7 +223,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # Query database
         result = Entry.select().where(
-            Entry.employee_name == self.employee_name and
+            Employee.name == self.employee_name and
             Entry.date == self.date and
             Entry.task_name == self.task_name and
             Entry.time_spent == self.time_spent and
@@ -203,7 +231,7 @@ class WorkLogUITests(unittest.TestCase):
         )
 
         # Assert entry in database
-        self.assertEqual(result[0].employee_name, self.employee_name)
+        self.assertEqual(result[0].employee.name, self.employee_name)
         self.assertEqual(result[0].date, self.date)
         self.assertEqual(result[0].task_name, self.task_name)
         self.assertEqual(result[0].time_spent, self.time_spent)
@@ -228,8 +256,9 @@ class WorkLogUITests(unittest.TestCase):
         # Assert there is 1 entry in the database
         self.assertEqual(result, 1)
 
-        # Delete entry from database
-        work_log_db.delete_entry(self.log_entry)
+        # Delete entry, as returned by a search, from database
+        entry = work_log_db.exact_date_search(self.date)[0]
+        work_log_db.delete_entry(entry)
 
         # Count number of entries in the database
         result = Entry.select().count()
@@ -239,9 +268,10 @@ class WorkLogUITests(unittest.TestCase):
 
     def test_edit_entry(self):
         """Test entry to see if it's been edited in database"""
-        # Add entry 1 to database and then edit it
+        # Add entry 1 to database and then edit it as returned by a search
         work_log_db.add_entry(self.log_entry)
-        work_log_db.edit_entry(self.log_entry, self.new_log_entry)
+        entry = work_log_db.exact_date_search(self.date)[0]
+        work_log_db.edit_entry(entry, self.new_log_entry)
 
         # Count number of entries in the database
         result = Entry.select().count()
@@ -251,7 +281,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # Query the edited entry from the database
         result = Entry.select().where(
-            Entry.employee_name == self.employee_name_new and
+            Employee.name == self.employee_name_new and
             Entry.date == self.date_new and
             Entry.task_name == self.task_name_new and
             Entry.time_spent == self.time_spent_new and
@@ -259,12 +289,31 @@ class WorkLogUITests(unittest.TestCase):
         )
 
         # Shows what's in the database is equal to the edited entry
-        self.assertEqual(result[0].employee_name, self.employee_name_new)
+        self.assertEqual(result[0].employee.name, self.employee_name_new)
         self.assertEqual(result[0].date, self.date_new)
         self.assertEqual(result[0].task_name, self.task_name_new)
         self.assertEqual(result[0].time_spent, self.time_spent_new)
         self.assertEqual(result[0].optional_notes, self.optional_notes_new)
 
+    def test_edit_and_delete_touch_one_row(self):
+        """Test edit and delete only change the entry they were given"""
+        # log_entry_1 and log_entry_2 are identical
+        work_log_db.add_entry(self.log_entry_1)
+        work_log_db.add_entry(self.log_entry_2)
+        first, second = work_log_db.exact_date_search(self.date_1)
+
+        # Editing one leaves its twin untouched
+        work_log_db.edit_entry(first, self.new_log_entry)
+        self.assertEqual(Entry.get_by_id(first['id']).task_name,
+                         self.task_name_new)
+        self.assertEqual(Entry.get_by_id(second['id']).task_name,
+                         self.task_name_2)
+
+        # Deleting the twin leaves the edited entry
+        work_log_db.delete_entry(second)
+        self.assertEqual(
+            [entry.id for entry in Entry.select()], [first['id']])
+
     def test_exact_date_search(self):
         """Test exact date search"""
         # Add 2 log entries with the same date and one that differs by date
@@ -288,7 +337,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # Entry 1 in database equals entry 1 from exact_date_search
         self.assertEqual(
-            result[0].employee_name, search_result[0]["employee_name"])
+            result[0].employee.name, search_result[0]["employee_name"])
         self.assertEqual(
             result[0].date, search_result[0]["date"])
         self.assertEqual(
@@ -300,7 +349,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # Entry 2 in database equals entry 2 from exact_date_search
         self.assertEqual(
-            result[1].employee_name, search_result[1]["employee_name"])
+            result[1].employee.name, search_result[1]["employee_name"])
         self.assertEqual(
             result[1].date, search_result[1]["date"])
         self.assertEqual(
@@ -346,7 +395,7 @@ class WorkLogUITests(unittest.TestCase):
         # from search result since results are returned in descending
         # order from the date_range_search
         self.assertEqual(
-            result[0].employee_name, search_result[2]["employee_name"])
+            result[0].employee.name, search_result[2]["employee_name"])
         self.assertEqual(
             result[0].date, search_result[2]["date"])
         self.assertEqual(
@@ -358,7 +407,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # Assert 2nd entry added equals middle list item
         self.assertEqual(
-            result[1].employee_name, search_result[1]["employee_name"])
+            result[1].employee.name, search_result[1]["employee_name"])
         self.assertEqual(
             result[1].date, search_result[1]["date"])
         self.assertEqual(
@@ -370,7 +419,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # Assert 3rd entry added equals first list item
         self.assertEqual(
-            result[2].employee_name, search_result[0]["employee_name"])
+            result[2].employee.name, search_result[0]["employee_name"])
         self.assertEqual(
             result[2].date, search_result[0]["date"])
         self.assertEqual(
@@ -409,7 +458,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # First entry added should equal search result's first entry
         self.assertEqual(
-            result[0].employee_name, search_result[0]["employee_name"])
+            result[0].employee.name, search_result[0]["employee_name"])
         self.assertEqual(
             result[0].date, search_result[0]["date"])
         self.assertEqual(
@@ -421,7 +470,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # Second entry added should equal search result's second entry
         self.assertEqual(
-            result[1].employee_name, search_result[1]["employee_name"])
+            result[1].employee.name, search_result[1]["employee_name"])
         self.assertEqual(
             result[1].date, search_result[1]["date"])
         self.assertEqual(
@@ -431,6 +480,68 @@ class WorkLogUITests(unittest.TestCase):
         self.assertEqual(
             result[1].optional_notes, search_result[1]["optional_notes"])
 
+    def test_time_spent_range_search(self):
+        """Test searching by a range or threshold of time spent"""
+        for minutes in [5, 60, 240, 241, '480']:
+            work_log_db.add_entry(dict(self.log_entry, time_spent=minutes))
+        self.assertEqual(
+            [entry['time_spent'] for entry in
+             work_log_db.time_spent_range_search(60, 240)], [240, 60])
+        self.assertEqual(
+            [entry['time_spent'] for entry in
+             work_log_db.time_spent_range_search(minimum=241)], [480, 241])
+        self.assertEqual(
+            len(work_log_db.time_spent_range_search(maximum=59)), 1)
+        # Minutes given as text are stored and searched as integers
+        self.assertEqual(len(work_log_db.time_spent_search('480')), 1)
+        self.assertEqual(Entry.get(Entry.time_spent == 480).time_spent, 480)
+        # Fractions are rounded as the migration rounds them, not truncated
+        self.assertEqual(work_log_db.add_entry(
+            dict(self.log_entry, time_spent=59.6))['time_spent'], 60)
+        self.assertEqual(len(work_log_db.time_spent_search(60)), 2)
+        self.assertEqual(len(work_log_db.time_spent_search('59.6')), 2)
+        self.assertEqual(
+            len(work_log_db.time_spent_range_search(59.6, 60.4)), 2)
+
+        # The range is a seek on the time_spent index
+        sql, params = work_log_db.search_query(
+            time_spent_range=(60, 240)).sql()
+        plan = ' '.join(row[-1] for row in test_database.execute_sql(
+            'EXPLAIN QUERY PLAN ' + sql, params))
+        self.assertIn('USING INDEX entry_time_spent_date', plan)
+
+    def test_parse_time_spent_range(self):
+        """Test the minutes, ranges and thresholds a user can search by"""
+        self.assertEqual(work_log.parse_time_spent_range('45'), (45, 45))
+        self.assertEqual(
+            work_log.parse_time_spent_range('60 - 240'), (60, 240))
+        self.assertEqual(work_log.parse_time_spent_range('>480'), (481, None))
+        self.assertEqual(
+            work_log.parse_time_spent_range('>=480'), (480, None))
+        self.assertEqual(work_log.parse_time_spent_range('<30'), (None, 29))
+        self.assertEqual(work_log.parse_time_spent_range('<=30'), (None, 30))
+        for text in ['', 'lots', '240-60', '>', '1.5-2']:
+            with self.assertRaises(ValueError):
+                work_log.parse_time_spent_range(text)
+
+    def test_time_spent_migration(self):
+        """Test migrating rounds time spent stored as fractions"""
+        self.start_from_first_schema()
+        for time_spent in ['30', 44.6, '59.6']:
+            test_database.execute_sql(
+                'INSERT INTO entry (employee_name, "date", task_name, '
+                'time_spent, optional_notes) VALUES (?, ?, ?, ?, ?)',
+                [self.employee_name, '2019-03-20', self.task_name,
+                 time_spent, ''])
+        work_log_db.migrate()
+        self.assertEqual(
+            test_database.execute_sql(
+                'SELECT time_spent, typeof(time_spent) FROM entry '
+                'ORDER BY id').fetchall(),
+            [(30, 'integer'), (45, 'integer'), (60, 'integer')])
+        self.assertEqual(len(work_log_db.time_spent_search(60)), 1)
+        self.assertEqual(len(work_log_db.time_spent_search(45)), 1)
+
     def test_exact_search(self):
         """Test exact search"""
         # Nothing added to database yet.  Search should return []
@@ -454,7 +565,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # Returns entry that was added to the database
         result = Entry.select().where(
-            Entry.employee_name == self.employee_name and
+            Employee.name == self.employee_name and
             Entry.date == self.date and
             Entry.task_name == self.task_name and
             Entry.time_spent == self.time_spent and
@@ -463,7 +574,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # Entry added should equal search_result
         self.assertEqual(
-            result[0].employee_name, search_result[0]["employee_name"])
+            result[0].employee.name, search_result[0]["employee_name"])
         self.assertEqual(
             result[0].date, search_result[0]["date"])
         self.assertEqual(
@@ -490,7 +601,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # Query entry from database
         result = Entry.select().where(
-            Entry.employee_name == self.employee_name and
+            Employee.name == self.employee_name and
             Entry.date == self.date and
             Entry.task_name == self.task_name and
             Entry.time_spent == self.time_spent and
@@ -499,7 +610,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # Entry added should equal search_result
         self.assertEqual(
-            result[0].employee_name, search_result[0]["employee_name"])
+            result[0].employee.name, search_result[0]["employee_name"])
         self.assertEqual(
             result[0].date, search_result[0]["date"])
         self.assertEqual(
@@ -523,7 +634,7 @@ class WorkLogUITests(unittest.TestCase):
 
         # Entry added should be first in search results
         self.assertEqual(
-            result[0].employee_name, search_result[0]["employee_name"])
+            result[0].employee.name, search_result[0]["employee_name"])
         self.assertEqual(
             result[0].date, search_result[0]["date"])
         self.assertEqual(
@@ -533,6 +644,1036 @@ class WorkLogUITests(unittest.TestCase):
         self.assertEqual(
             result[0].optional_notes, search_result[0]["optional_notes"])
 
+    def test_initialize_skips_checked_schema(self):
+        """Test initialize only checks the tables of an unstamped database"""
+        self.start_from_first_schema()
+        self.assertFalse(work_log_db.schema_is_current())
+        work_log_db.initialize()
+        self.assertTrue(work_log_db.schema_is_current())
+
+        statements = []
+        connection = test_database.connection()
+        connection.set_trace_callback(statements.append)
+        try:
+            with patch('work_log_db.migrate') as migrate:
+                work_log_db.initialize()
+        finally:
+            connection.set_trace_callback(None)
+        migrate.assert_not_called()
+        self.assertNotIn(work_log_db.ENTRY_TABLE_0, statements)
+        self.assertEqual(statements, ['PRAGMA user_version'])
+
+    def test_lazy_startup(self):
+        """Test work_log.py doesn't import peewee before it's needed"""
+        directory = os.path.dirname(os.path.abspath(__file__))
+        imported = subprocess.run(
+            [sys.executable, '-c',
+             'import sys, work_log; print("peewee" in sys.modules)'],
+            cwd=directory, stdout=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(imported.stdout, 'False\n')
+
+        # Invalid arguments fail before the database is touched
+        failed = subprocess.run(
+            [sys.executable, 'work_log.py', '--startup-profile',
+             'delete', '--id', 'one'],
+            cwd=directory, stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(failed.returncode, 2)
+        self.assertIn('import work_log ', failed.stderr)
+        self.assertNotIn('import work_log_db', failed.stderr)
+
+    def test_migrate(self):
+        """Test migrate brings the schema up to date exactly once"""
+        # A database from before any migration was recorded
+        self.start_from_first_schema()
+        self.assertEqual(work_log_db.schema_version(), 0)
+
+        # All migrations are applied on the first run
+        applied = work_log_db.migrate()
+        latest = work_log_db.MIGRATIONS[-1][0]
+        self.assertEqual(applied[-1], latest)
+        self.assertEqual(work_log_db.schema_version(), latest)
+
+        # Nothing is applied on the second run
+        self.assertEqual(work_log_db.migrate(), [])
+
+        # The search indexes exist after migrating
+        indexes = [
+            index.columns for index in test_database.get_indexes('entry')]
+        self.assertIn(['date'], indexes)
+        self.assertIn(['employee_id', 'date'], indexes)
+        self.assertIn(['time_spent', 'date'], indexes)
+
+        # The migrated tables have the columns of the models
+        for model in [Entry, Employee]:
+            self.assertEqual(
+                [column.name for column in test_database.get_columns(
+                    model._meta.table_name)],
+                [field.column_name for field in model._meta.sorted_fields])
+
+    def test_employee_name_prefix_search(self):
+        """Test employee names match by prefix, ignoring case and extra
+        whitespace, through the employee key index
+        """
+        work_log_db.add_entry(self.log_entry)
+        work_log_db.add_entry(self.new_log_entry)
+        work_log_db.add_entry(dict(
+            self.log_entry, employee_name='Mary  JOHNSON'))
+
+        for name in ['john', 'JOHN smith', ' John   Smith ']:
+            self.assertEqual(
+                [entry['employee_name'] for entry in
+                 work_log_db.employee_name_search(name)], ['John Smith'])
+        self.assertEqual(work_log_db.employee_search_stats(), {
+            'mode': 'prefix', 'matches': 1, 'estimated_rows_examined': 2})
+        self.assertEqual(work_log_db.employee_name_search('smith'), [])
+
+        # Substring matching finds names anywhere, by reading every employee
+        self.assertEqual(
+            sorted(entry['employee_name'] for entry in
+                   work_log_db.employee_name_search('john', 'substring')),
+            ['John Smith', 'Mary  JOHNSON'])
+        self.assertEqual(work_log_db.employee_search_stats(), {
+            'mode': 'substring', 'matches': 2,
+            'estimated_rows_examined': 5})
+        with self.assertRaises(ValueError):
+            work_log_db.employee_name_search('john', 'suffix')
+
+        # Either way the entries are found by employee id
+        for mode in ['prefix', 'substring']:
+            sql, params = work_log_db.search_query(
+                employee_name='jo', employee_match=mode).sql()
+            plan = ' '.join(row[-1] for row in test_database.execute_sql(
+                'EXPLAIN QUERY PLAN ' + sql, params))
+            self.assertIn('INDEX employee_key', plan)
+            self.assertIn('USING INDEX entry_employee_id_date', plan)
+
+    def test_employee_migration(self):
+        """Test migrating moves the employee names of existing entries to
+        the employee table
+        """
+        self.start_from_first_schema()
+        for name in ['John Smith', 'JANE  Rogers', 'John Smith']:
+            test_database.execute_sql(
+                'INSERT INTO entry (employee_name, "date", task_name, '
+                'time_spent, optional_notes) VALUES (?, ?, ?, ?, ?)',
+                [name, '2019-03-20', self.task_name, 5, ''])
+        work_log_db.migrate()
+        self.assertEqual(
+            test_database.execute_sql(
+                'SELECT name, "key" FROM employee ORDER BY id').fetchall(),
+            [('John Smith', 'john smith'), ('JANE  Rogers', 'jane rogers')])
+        self.assertEqual(
+            test_database.execute_sql(
+                'SELECT id, employee_id FROM entry ORDER BY id').fetchall(),
+            [(1, 1), (2, 2), (3, 1)])
+        self.assertEqual(
+            [entry['employee_name'] for entry in
+             work_log_db.employee_name_search('jane r')], ['JANE  Rogers'])
+        self.assertEqual(
+            [(total['employee_name'], total['total_minutes'])
+             for total in work_log_db.time_totals(self.date, self.date)],
+            [('JANE  Rogers', 5), ('John Smith', 10)])
+
+        # A name is stored once however many entries have it
+        work_log_db.add_entry(self.log_entry)
+        self.assertEqual(Employee.select().count(), 2)
+        self.assertEqual(len(work_log_db.employee_name_search('john')), 3)
+
+    def test_date_searches_use_index(self):
+        """Test exact_date_search and date_range_search seek the date index
+        and return rows in date order without sorting
+        """
+        work_log_db.migrate()
+        connection = test_database.connection()
+        for search, arguments in [
+                (work_log_db.exact_date_search, [self.date]),
+                (work_log_db.date_range_search,
+                 [self.date_dr_1, self.date_dr_3])]:
+            # Explain the statement the search runs, parameters filled in
+            statements = []
+            connection.set_trace_callback(statements.append)
+            try:
+                search(*arguments)
+            finally:
+                connection.set_trace_callback(None)
+            statement, = statements
+            plan = ' '.join(row[-1] for row in test_database.execute_sql(
+                'EXPLAIN QUERY PLAN ' + statement))
+
+            self.assertIn('SEARCH', plan)
+            self.assertIn('USING INDEX entry_date', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_date_migration(self):
+        """Test migrating rewrites dates as YYYY-MM-DD and then only
+        accepts dates in that form
+        """
+        self.start_from_first_schema()
+        for date in ['2019/03/20', '2019-03-20 00:00:00', '2019-03-21']:
+            test_database.execute_sql(
+                'INSERT INTO entry (employee_name, "date", task_name, '
+                'time_spent, optional_notes) VALUES (?, ?, ?, ?, ?)',
+                [self.employee_name, date, self.task_name, 5, ''])
+
+        work_log_db.migrate()
+        self.assertEqual(
+            [row[0] for row in test_database.execute_sql(
+                'SELECT "date" FROM entry ORDER BY id')],
+            ['2019-03-20', '2019-03-20', '2019-03-21'])
+        self.assertEqual(len(work_log_db.exact_date_search(self.date)), 2)
+        self.assertEqual(
+            [total['total_minutes'] for total in work_log_db.time_totals(
+                self.date, datetime.date(2019, 3, 21))], [10, 5])
+
+        # The triggers were recreated along with the table
+        work_log_db.add_entry(self.log_entry)
+        self.assertEqual(len(work_log_db.exact_search('add entry')), 4)
+        with self.assertRaises(IntegrityError):
+            test_database.execute_sql(
+                'INSERT INTO entry (employee_id, "date", task_name, '
+                'time_spent, optional_notes) VALUES (?, ?, ?, ?, ?)',
+                [1, '2019/03/22', self.task_name, 5, ''])
+
+    def test_exact_search_full_text(self):
+        """Test exact_search through the entry_fts index"""
+        work_log_db.migrate()
+        self.assertTrue(work_log_db.has_full_text_index())
+
+        # Triggers index entries as they are added
+        work_log_db.add_entry(self.log_entry_dr_1)  # 2019/3/1, apples
+        work_log_db.add_entry(self.log_entry_3)  # 2019/4/4, log entry 3
+        work_log_db.add_entry(self.log_entry_5)  # 2019/4/2, apple less
+
+        # Substring and case-insensitive matches, ordered by date
+        search_result = work_log_db.exact_search('APPLE')
+        self.assertEqual(
+            [entry['date'] for entry in search_result],
+            [self.date_3, self.date_5, self.date_dr_1])
+
+        # Full-text and LIKE searches agree
+        for term in ['apple', 'less', 'log entry', 'ap', 'missing', '"']:
+            self.assertEqual(
+                work_log_db.exact_search(term),
+                work_log_db.exact_search(term, full_text=False))
+
+        # The index is looked up once per connection, not every search
+        with patch.object(test_database, 'table_exists') as table_exists:
+            work_log_db.exact_search('apple')
+        table_exists.assert_not_called()
+
+        # Triggers keep the index in sync with edits and deletes
+        entry = Entry.get(Entry.task_name == self.task_name_5)
+        entry.optional_notes = 'pears'
+        entry.save()
+        self.assertEqual(len(work_log_db.exact_search('apple')), 2)
+        Entry.delete().where(Entry.task_name == self.task_name_3).execute()
+        self.assertEqual(len(work_log_db.exact_search('apple')), 1)
+        self.assertEqual(len(work_log_db.exact_search('pears')), 1)
+
+        # A new connection looks it up again
+        test_database.close()
+        test_database.connect()
+        self.assertFalse(work_log_db.has_full_text_index())
+
+    def test_search_results(self):
+        """Test lazily fetched search results match the list results"""
+        for day in range(1, 29):
+            for _ in range(2):
+                work_log_db.add_entry(
+                    dict(self.log_entry, date=datetime.date(2019, 2, day)))
+        expected = work_log_db.time_spent_search(self.time_spent)
+
+        results = work_log_db.time_spent_search(self.time_spent, lazy=True)
+        results.page_size = 5
+        results.max_pages = 2
+        self.assertEqual(len(results), len(expected))
+
+        # Walk forward then backward, the window never exceeds 2 pages
+        for count in list(range(len(expected))) + list(
+                reversed(range(len(expected)))):
+            self.assertEqual(results[count], expected[count])
+            self.assertLessEqual(len(results._rows), 10)
+
+        # Jumps to the last and first results
+        self.assertEqual(results[-1], expected[-1])
+        self.assertEqual(results[0], expected[0])
+        with self.assertRaises(IndexError):
+            results[len(expected)]
+
+        # Deleted results are dropped without refetching
+        work_log_db.delete_entry(results[1])
+        del results[1]
+        del expected[1]
+        self.assertEqual(len(results), len(expected))
+        self.assertEqual(list(results), expected)
+
+    def test_search_row(self):
+        """Test search results read and change like dicts"""
+        work_log_db.add_entry(self.log_entry)
+        entry = work_log_db.exact_date_search(self.date)[0]
+        self.assertIsInstance(entry, work_log_db.SearchRow)
+        self.assertFalse(hasattr(entry, '__dict__'))
+        self.assertEqual(entry, dict(self.log_entry, id=entry.id))
+        self.assertEqual(list(entry), list(work_log_db.ENTRY_COLUMNS))
+        self.assertEqual(entry['employee_name'], entry.employee_name)
+        self.assertIsNone(entry.get('keys'))
+        with self.assertRaises(KeyError):
+            entry['missing']
+        with self.assertRaises(KeyError):
+            entry['missing'] = 1
+
+        entry['task_name'] = 'Renamed'
+        self.assertEqual(entry.task_name, 'Renamed')
+        self.assertEqual(work_log_db.get_entry(entry.id),
+                         dict(entry, task_name=self.task_name))
+
+    def test_add_entries(self):
+        """Test add_entries inserts every entry across batches"""
+        entries = [self.log_entry_1, self.log_entry_3, self.log_entry_5] * 3
+        added = work_log_db.add_entries(iter(entries), batch_size=2)
+        self.assertEqual(added, 9)
+        self.assertEqual(Entry.select().count(), 9)
+        self.assertEqual(
+            Entry.select().where(Entry.task_name == self.task_name_5).count(),
+            3)
+
+    def test_import_entries(self):
+        """Test CSV and JSONL imports insert valid rows and report the rest"""
+        csv_lines = [
+            'employee_name,date,task_name,time_spent,optional_notes\n',
+            'John Smith,2019/03/20,entry,5,apples\n',
+            'Jane Rogers,2019-02-12,edited entry,10,\n',
+            ',2019/03/20,entry,5,no name\n',
+            'John Smith,19/3/20,entry,5,short year\n',
+            'John Smith,2019/03/20,entry,0,no time\n',
+        ]
+        report = work_log_import.import_entries(csv_lines, 'csv')
+        self.assertEqual(report.imported, 2)
+        self.assertEqual([line for line, _ in report.rejected], [4, 5, 6])
+
+        jsonl_lines = [
+            '{"employee_name": "Larry Apple", "date": "2019/04/02", '
+            '"task_name": "log entry 5", "time_spent": 15}\n',
+            '\n',
+            'not json\n',
+            '{"employee_name": "Larry Apple", "date": "2019/04/02", '
+            '"task_name": "log entry 5", "time_spent": 1.5}\n',
+        ]
+        report = work_log_import.import_entries(
+            jsonl_lines, 'jsonl', batch_size=1)
+        self.assertEqual(report.imported, 1)
+        self.assertEqual([line for line, _ in report.rejected], [3, 4])
+
+        # Only the valid rows were added
+        self.assertEqual(Entry.select().count(), 3)
+        entry = Entry.select().join(Employee).where(
+            Employee.name == self.employee_name_5).get()
+        self.assertEqual(entry.date, self.date_5)
+        self.assertEqual(entry.time_spent, self.time_spent_5)
+        self.assertEqual(entry.optional_notes, '')
+
+    def test_export_entries(self):
+        """Test export writes the entries matching every criterion"""
+        work_log_db.add_entry(self.log_entry_3)  # 2019/4/4, Larry Appleton
+        work_log_db.add_entry(self.log_entry_4)  # 2019/4/3, Larry Appleton
+        work_log_db.add_entry(self.log_entry_5)  # 2019/4/2, Larry Apple
+        work_log_db.add_entry(self.log_entry_dr_3)  # 2019/4/3, John Smith
+
+        output = io.StringIO()
+        count = work_log_export.export_entries(
+            output, 'csv',
+            date_range=(self.date_5, self.date_4),
+            employee_name='Larry')
+        self.assertEqual(count, 2)
+        self.assertEqual(output.getvalue().splitlines(), [
+            'id,employee_name,date,task_name,time_spent,optional_notes',
+            '2,Larry Appleton,2019-04-03,log entry 4,15,apples x 2',
+            '3,Larry Apple,2019-04-02,log entry 5,15,apple less',
+        ])
+
+        output = io.StringIO()
+        count = work_log_export.export_entries(
+            output, 'jsonl', exact_string='x 2')
+        self.assertEqual(count, 1)
+        self.assertEqual(json.loads(output.getvalue()), {
+            'id': 2,
+            'employee_name': self.employee_name_4,
+            'date': '2019-04-03',
+            'task_name': self.task_name_4,
+            'time_spent': self.time_spent_4,
+            'optional_notes': self.optional_notes_4,
+        })
+
+    def test_read_config(self):
+        """Test the config file is overridden by environment variables"""
+        with tempfile.TemporaryDirectory() as directory:
+            config_file = os.path.join(directory, 'work_log.ini')
+            with open(config_file, 'w') as config:
+                config.write(
+                    '[database]\npath = team.db\nprofile = fast\n'
+                    '[pragmas]\ncache_size = -8000\n')
+
+            environ = {'WORK_LOG_CONFIG': config_file}
+            self.assertEqual(
+                work_log_db.read_config(environ),
+                ('team.db', 'fast', {'cache_size': '-8000'}))
+
+            environ['WORK_LOG_DB'] = 'other.db'
+            environ['WORK_LOG_PROFILE'] = 'bulk-load'
+            self.assertEqual(
+                work_log_db.read_config(environ),
+                ('other.db', 'bulk-load', {'cache_size': '-8000'}))
+
+        # Without a config file the defaults are used
+        self.assertEqual(
+            work_log_db.read_config({'WORK_LOG_CONFIG': config_file}),
+            ('work_log.db', 'safe', {}))
+
+    def test_configure(self):
+        """Test configure connects with the pragmas of the profile"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'fast.db')
+            database = work_log_db.configure(path, 'fast', cache_size=-1000)
+            try:
+                self.assertEqual(database.database, path)
+                self.assertEqual(database.pragma('journal_mode'), 'wal')
+                self.assertEqual(database.pragma('synchronous'), 1)
+                self.assertEqual(database.pragma('cache_size'), -1000)
+            finally:
+                work_log_db.configure()
+
+        with self.assertRaises(ValueError):
+            work_log_db.configure(profile='fastest')
+
+    def test_benchmark_data_is_deterministic(self):
+        """Test the benchmark generator repeats itself for a seed"""
+        first = list(benchmarks.generate_entries(200, seed=3))
+        self.assertEqual(first, list(benchmarks.generate_entries(200, seed=3)))
+        self.assertNotEqual(
+            first, list(benchmarks.generate_entries(200, seed=4)))
+
+        # Every generated entry passes the importer's validation
+        for entry in first:
+            row = dict(entry, date=entry['date'].strftime('%Y/%m/%d'))
+            self.assertEqual(work_log_import.validate_row(row), entry)
+
+    def test_benchmark_compare(self):
+        """Test compare flags operations slower than the threshold"""
+        def report(*timings):
+            return {'results': [
+                {'rows': 10000, 'operation': operation, 'median_s': median}
+                for operation, median in timings]}
+
+        comparison = benchmarks.compare_reports(
+            report(('add_entry', 1.0), ('exact_search', 2.0)),
+            report(('add_entry', 1.05), ('exact_search', 2.5),
+                   ('new_search', 1.0)),
+            threshold=0.1)
+        self.assertEqual(comparison, [
+            (10000, 'add_entry', 1.0, 1.05, False),
+            (10000, 'exact_search', 2.0, 2.5, True),
+        ])
+
+    def test_search_cache(self):
+        """Test cached searches are served until a write invalidates them"""
+        self.assertIsNone(work_log_db.cache_stats())
+        work_log_db.enable_cache(max_entries=2)
+        try:
+            work_log_db.add_entry(self.log_entry_3)
+            first = work_log_db.employee_name_search('Larry')
+            self.assertIsInstance(first[0], work_log_db.SearchRow)
+            self.assertEqual(work_log_db.employee_name_search('Larry'), first)
+            # Spelled out defaults are the same search
+            self.assertEqual(
+                work_log_db.employee_name_search('Larry', mode='prefix'),
+                first)
+            stats = work_log_db.cache_stats()
+            self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+
+            # Lazy results bypass the cache however lazy is passed
+            self.assertIsInstance(
+                work_log_db.employee_name_search('Larry', 'prefix', True),
+                work_log_db.SearchResults)
+            stats = work_log_db.cache_stats()
+            self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+
+            # Callers get copies they can edit without touching the cache
+            first[0]['task_name'] = 'changed'
+            self.assertEqual(
+                work_log_db.employee_name_search('Larry')[0]['task_name'],
+                self.task_name_3)
+
+            # A write drops the cached results
+            work_log_db.add_entry(self.log_entry_4)
+            self.assertEqual(len(work_log_db.employee_name_search('Larry')), 2)
+            self.assertEqual(work_log_db.cache_stats()['invalidations'], 1)
+
+            # The least recently used result is evicted past max_entries
+            work_log_db.time_spent_search(15)
+            work_log_db.exact_search('apples')
+            stats = work_log_db.cache_stats()
+            self.assertEqual((stats['entries'], stats['evictions']), (2, 1))
+            self.assertGreater(stats['bytes'], 0)
+        finally:
+            work_log_db.disable_cache()
+
+    def test_search_cache_menu_searches(self):
+        """Test the menu's distinct values and lazy searches are cached"""
+        work_log_db.enable_cache()
+        try:
+            work_log_db.add_entry(self.log_entry_3)
+            work_log_db.add_entry(self.log_entry_4)
+            for _ in range(2):
+                values = work_log_db.distinct_values(
+                    'date', date_range=(self.date_4, self.date_3))
+                results = work_log_db.exact_date_search(
+                    values[0][0], lazy=True)
+                self.assertEqual(len(results), 1)
+                results[0]['task_name'] = 'changed'
+            stats = work_log_db.cache_stats()
+            self.assertEqual((stats['hits'], stats['misses']), (3, 3))
+            self.assertEqual(work_log_db.distinct_values(
+                'date', date_range=(self.date_4, self.date_3)), values)
+            self.assertNotEqual(
+                work_log_db.exact_date_search(
+                    values[0][0], lazy=True)[0]['task_name'], 'changed')
+
+            work_log_db.add_entry(self.log_entry_4)
+            self.assertEqual(len(work_log_db.exact_date_search(
+                values[0][0], lazy=True)), 2)
+        finally:
+            work_log_db.disable_cache()
+
+    def test_search_cache_external_change(self):
+        """Test commits from another connection invalidate the cache"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.db')
+            file_database = SqliteDatabase(path)
+            work_log_db.enable_cache()
+            try:
+                with file_database.bind_ctx(
+                        [Entry, Employee], bind_refs=False,
+                        bind_backrefs=False):
+                    work_log_db.initialize()
+                    work_log_db.add_entry(self.log_entry_3)
+                    work_log_db.exact_search('apples')
+                    work_log_db.exact_search('apples')
+
+                    # Another process adds an entry behind work_log_db
+                    other = SqliteDatabase(path)
+                    other.execute_sql(
+                        "INSERT INTO entry (employee_id, date, task_name, "
+                        "time_spent, optional_notes) SELECT id, "
+                        "'2019-04-03', 'log entry 4', 15, 'apples x 2' "
+                        "FROM employee")
+                    other.close()
+
+                    self.assertEqual(
+                        len(work_log_db.exact_search('apples')), 2)
+                    stats = work_log_db.cache_stats()
+                    self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+                    # A new connection starts its own data_version count
+                    # at 1, even where it takes the place of the old one
+                    file_database.close()
+                    file_database.connect()
+                    self.assertEqual(
+                        len(work_log_db.exact_search('apples')), 2)
+                    other.connect()
+                    other.execute_sql(
+                        "INSERT INTO entry (employee_id, date, task_name, "
+                        "time_spent, optional_notes) SELECT id, "
+                        "'2019-04-02', 'log entry 5', 15, 'apples x 3' "
+                        "FROM employee")
+                    other.close()
+                    file_database.close()
+                    file_database.connect()
+                    self.assertEqual(
+                        len(work_log_db.exact_search('apples')), 3)
+            finally:
+                work_log_db.disable_cache()
+                file_database.close()
+
+    def test_connection_pool_threads(self):
+        """Test adding and searching from many threads at once on the
+        connection pools
+        """
+        threads, adds = 8, 25
+        errors = []
+
+        def worker(number):
+            try:
+                for count in range(adds):
+                    work_log_db.add_entry(dict(
+                        self.log_entry,
+                        task_name='task {} {}'.format(number, count)))
+                    work_log_db.exact_date_search(self.date)
+                    work_log_db.employee_name_search(
+                        self.employee_name, lazy=True)[0]
+                    work_log_db.exact_search('task {} '.format(number))
+            except Exception as error:
+                errors.append(error)
+
+        with tempfile.TemporaryDirectory() as directory:
+            pools = work_log_db.configure_pool(
+                os.path.join(directory, 'pool.db'), max_connections=4)
+            try:
+                workers = [threading.Thread(target=worker, args=(number,))
+                           for number in range(threads)]
+                for thread in workers:
+                    thread.start()
+                for thread in workers:
+                    thread.join()
+
+                self.assertEqual(errors, [])
+                self.assertEqual(
+                    len(work_log_db.exact_date_search(self.date)),
+                    threads * adds)
+                for number in range(threads):
+                    self.assertEqual(len(work_log_db.exact_search(
+                        'task {} '.format(number))), adds)
+                # Every connection was handed back to its pool
+                self.assertEqual(pools.read._in_use, {})
+                self.assertEqual(pools.write._in_use, {})
+            finally:
+                work_log_db.disable_pool()
+
+        # The bound test database is used again without the pools
+        self.assertEqual(work_log_db.exact_date_search(self.date), [])
+
+    def test_connection_pool_idle_timeout(self):
+        """Test pooled connections are closed once idle, not once old"""
+        with tempfile.TemporaryDirectory() as directory:
+            pools = work_log_db.configure_pool(
+                os.path.join(directory, 'idle.db'), idle_timeout=0.2)
+            try:
+                work_log_db.exact_date_search(self.date)
+                (_, connection), = pools.read._connections
+
+                # In steady use it outlives idle_timeout
+                for _ in range(6):
+                    time.sleep(0.05)
+                    work_log_db.exact_date_search(self.date)
+                self.assertEqual(
+                    [pooled for _, pooled in pools.read._connections],
+                    [connection])
+
+                # Idle, it is closed when the pool is next used
+                time.sleep(0.3)
+                work_log_db.exact_date_search(self.date)
+                (_, replacement), = pools.read._connections
+                self.assertIsNot(replacement, connection)
+                with self.assertRaises(sqlite3.ProgrammingError):
+                    connection.execute('SELECT 1')
+            finally:
+                work_log_db.disable_pool()
+
+    def test_concurrent_add_entry(self):
+        """Test adds from many threads, each on its own connection, wait
+        for the writer rather than failing with database is locked
+        """
+        threads, adds = 16, 5
+        errors = []
+
+        def worker(number):
+            try:
+                for count in range(adds):
+                    work_log_db.add_entry(dict(
+                        self.log_entry,
+                        employee_name='Employee {} {}'.format(number, count)))
+            except Exception as error:
+                errors.append(error)
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_database = SqliteDatabase(
+                os.path.join(directory, 'concurrent.db'),
+                pragmas=work_log_db.PRAGMA_PROFILES['fast'])
+            try:
+                with file_database.bind_ctx(
+                        [Entry, Employee], bind_refs=False,
+                        bind_backrefs=False):
+                    work_log_db.initialize()
+                    workers = [threading.Thread(target=worker, args=(number,))
+                               for number in range(threads)]
+                    for thread in workers:
+                        thread.start()
+                    for thread in workers:
+                        thread.join()
+
+                    self.assertEqual(errors, [])
+                    self.assertEqual(
+                        len(work_log_db.exact_date_search(self.date)),
+                        threads * adds)
+            finally:
+                file_database.close()
+
+    def test_group_commit(self):
+        """Test concurrent adds are committed together and every caller
+        gets its own id
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            work_log_db.configure_pool(os.path.join(directory, 'group.db'))
+            writer = work_log_db.enable_group_commit(
+                max_batch=8, max_delay=0.05)
+            try:
+                added = []
+                workers = [threading.Thread(
+                    target=lambda: added.append(
+                        work_log_db.add_entry(self.log_entry)))
+                    for _ in range(16)]
+                for thread in workers:
+                    thread.start()
+                for thread in workers:
+                    thread.join()
+                self.assertEqual(sorted(entry['id'] for entry in added),
+                                 list(range(1, 17)))
+
+                stats = work_log_db.group_commit_stats()
+                self.assertEqual(stats['entries'], 16)
+                self.assertLess(stats['batches'], 16)
+                self.assertLessEqual(stats['max_batch_size'], 8)
+
+                # Closing commits whatever is still queued
+                futures = [writer.submit(self.log_entry) for _ in range(3)]
+                work_log_db.disable_group_commit()
+                self.assertEqual(
+                    [future.result(0)['id'] for future in futures],
+                    [17, 18, 19])
+                self.assertIsNone(work_log_db.group_commit_stats())
+                self.assertEqual(
+                    len(work_log_db.exact_date_search(self.date)), 19)
+
+                # A submit racing the close fails rather than waits forever
+                self.assertIsInstance(
+                    writer.submit(self.log_entry).exception(0), RuntimeError)
+            finally:
+                work_log_db.disable_group_commit()
+                work_log_db.disable_pool()
+
+    def test_group_commit_bad_entries(self):
+        """Test a bad entry only fails its own caller, not its batch"""
+        with tempfile.TemporaryDirectory() as directory:
+            work_log_db.configure_pool(os.path.join(directory, 'group.db'))
+            writer = work_log_db.enable_group_commit(
+                max_batch=3, max_delay=5)
+            try:
+                futures = [
+                    writer.submit(self.log_entry),
+                    # Rejected by submit, never joins the batch
+                    writer.submit(dict(self.log_entry, date='2019/01/02')),
+                    writer.submit(self.log_entry_3),
+                    # Fails the batch's transaction on NOT NULL
+                    writer.submit(dict(self.log_entry, optional_notes=None)),
+                ]
+                self.assertIsInstance(futures[1].exception(0), ValueError)
+                self.assertIsInstance(futures[3].exception(10), IntegrityError)
+                self.assertEqual(futures[0].result(0)['id'], 1)
+                self.assertEqual(futures[2].result(0)['id'], 2)
+
+                stats = work_log_db.group_commit_stats()
+                self.assertEqual((stats['entries'], stats['errors']), (2, 2))
+                self.assertEqual(
+                    len(work_log_db.date_range_search(
+                        self.date, self.date_3)), 2)
+            finally:
+                work_log_db.disable_group_commit()
+                work_log_db.disable_pool()
+
+    def test_query_timing(self):
+        """Test calls are counted and slow ones logged with query plans"""
+        self.assertIsNone(work_log_db.query_timing_stats())
+        self.assertIsNone(work_log_db.slow_queries())
+        slow_log = io.StringIO()
+        work_log_db.enable_query_timing(10, slow_log)
+        try:
+            work_log_db.add_entry(self.log_entry)
+            work_log_db.add_entry(self.log_entry_3)
+            work_log_db.exact_date_search(self.date)
+            work_log_db.exact_search(self.optional_notes)
+            self.assertEqual(
+                len(list(work_log_db.iter_entries(date=self.date))), 1)
+
+            stats = work_log_db.query_timing_stats()
+            # exact_search's has_full_text_index call counts towards it
+            self.assertEqual(sorted(stats), [
+                'add_entry', 'exact_date_search', 'exact_search',
+                'iter_entries'])
+            self.assertEqual(stats['add_entry']['calls'], 2)
+            self.assertEqual(stats['add_entry']['rows'], 2)
+            self.assertEqual(stats['exact_date_search']['rows'], 1)
+            self.assertEqual(stats['exact_date_search']['statements'], 1)
+            self.assertEqual(stats['iter_entries']['rows'], 1)
+            self.assertGreater(stats['exact_search']['wall'], 0)
+            self.assertEqual(work_log_db.slow_queries(), [])
+            self.assertEqual(slow_log.getvalue(), '')
+
+            # Everything is slow with a threshold of 0
+            work_log_db.enable_query_timing(0, slow_log)
+            work_log_db.exact_date_search(self.date)
+            slow, = work_log_db.slow_queries()
+            self.assertEqual(slow['function'], 'exact_date_search')
+            self.assertEqual(slow['arguments'], repr(self.date))
+            self.assertEqual(slow['rows'], 1)
+            (statement, plan), = slow['statements']
+            self.assertIn("= '2019-03-20'", statement)
+            self.assertIn('USING INDEX entry_date', plan[0])
+            self.assertIn('slow work_log_db call exact_date_search(',
+                          slow_log.getvalue())
+            self.assertIn(plan[0], slow_log.getvalue())
+        finally:
+            work_log_db.disable_query_timing()
+        self.assertIsNone(work_log_db.query_timing_stats())
+
+    def test_query_timing_iterator(self):
+        """Test a generator closed early is recorded, without the
+        statements run between its items
+        """
+        for _ in range(3):
+            work_log_db.add_entry(self.log_entry)
+        work_log_db.enable_query_timing(0)
+        try:
+            rows = work_log_db.iter_entries(date=self.date)
+            for _ in rows:
+                test_database.execute_sql('SELECT 1')
+                break
+            rows.close()
+
+            stats = work_log_db.query_timing_stats()
+            self.assertEqual(sorted(stats), ['iter_entries'])
+            self.assertEqual(
+                (stats['iter_entries']['calls'],
+                 stats['iter_entries']['rows']), (1, 1))
+            slow, = work_log_db.slow_queries()
+            (statement, _), = slow['statements']
+            self.assertNotIn('SELECT 1', statement)
+        finally:
+            work_log_db.disable_query_timing()
+
+    def test_async_work_log(self):
+        """Test concurrent coroutines adding, searching and streaming"""
+        async def session():
+            async with work_log_async.AsyncWorkLog(readers=4) as work_log:
+                added = await asyncio.gather(*[
+                    work_log.add_entry(dict(
+                        self.log_entry, task_name='task {}'.format(number)))
+                    for number in range(20)])
+                self.assertEqual(sorted(entry['id'] for entry in added),
+                                 list(range(1, 21)))
+
+                by_date, by_name, exact = await asyncio.gather(
+                    work_log.exact_date_search(self.date),
+                    work_log.employee_name_search(self.employee_name),
+                    work_log.exact_search('task 1'))
+                self.assertEqual(len(by_date), 20)
+                self.assertEqual(by_name, by_date)
+                self.assertEqual(len(exact), 11)  # task 1, task 10-19
+
+                await work_log.edit_entry(
+                    added[0], dict(added[0], time_spent=90))
+                await work_log.delete_entry(added[1])
+                self.assertEqual(
+                    (await work_log.get_entry(added[0]['id']))['time_spent'],
+                    90)
+
+                ids = [row[0] async for row in work_log.iter_entries(
+                    batch_size=3, date=self.date)]
+                self.assertEqual(len(ids), 19)
+                # Stopping early hands the reader back
+                async with contextlib.aclosing(
+                        work_log.iter_entries(batch_size=2)) as rows:
+                    async for row in rows:
+                        break
+                self.assertEqual(
+                    len(await work_log.time_spent_search(self.time_spent)),
+                    18)
+                self.assertEqual(
+                    len(await work_log.time_spent_range_search(
+                        self.time_spent, 90)), 19)
+                self.assertEqual(
+                    len(await work_log.employee_name_search(
+                        self.employee_name[1:], 'substring')), 19)
+                self.assertEqual(
+                    await work_log.employee_name_search(
+                        self.employee_name[1:]), [])
+
+        with tempfile.TemporaryDirectory() as directory:
+            pools = work_log_db.configure_pool(
+                os.path.join(directory, 'async.db'))
+            try:
+                asyncio.run(session())
+                self.assertEqual(pools.read._in_use, {})
+            finally:
+                work_log_db.disable_pool()
+
+    def test_server(self):
+        """Test the JSON API on one kept alive connection, and the load
+        generator against it
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            work_log_db.configure_pool(os.path.join(directory, 'server.db'))
+            server = work_log_server.make_server(port=0, workers=4)
+            work_log_server.WorkLogHandler.quiet = True
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            connection = http.client.HTTPConnection(
+                *server.server_address[:2])
+
+            def request(method, path, body=None):
+                connection.request(
+                    method, path, body and json.dumps(body))
+                response = connection.getresponse()
+                return response.status, json.loads(response.read())
+
+            try:
+                body = dict(self.log_entry, date='2019-03-20')
+                status, entry = request('POST', '/entries', body)
+                self.assertEqual(status, 201)
+                self.assertEqual(entry, dict(body, id=1))
+                request('POST', '/entries', body)
+
+                status, page = request(
+                    'GET', '/search/exact_date?date=2019/03/20&per_page=1')
+                self.assertEqual(status, 200)
+                self.assertEqual(page['total'], 2)
+                self.assertEqual([e['id'] for e in page['entries']], [2])
+                status, page = request(
+                    'GET', '/search/exact?term=apples&page=2&per_page=1')
+                self.assertEqual([e['id'] for e in page['entries']], [1])
+
+                status, entry = request('PUT', '/entries/1',
+                                        {'time_spent': 45})
+                self.assertEqual(entry['time_spent'], 45)
+                self.assertEqual(request('GET', '/entries/1')[1], entry)
+                self.assertEqual(request('DELETE', '/entries/1')[0], 200)
+
+                self.assertEqual(request('GET', '/entries/1')[0], 404)
+                self.assertEqual(request('GET', '/search/nothing')[0], 404)
+                status, error = request(
+                    'GET', '/search/time_spent?minutes=none')
+                self.assertEqual(status, 400)
+                self.assertIn('valid integer', error['error'])
+                self.assertEqual(request(
+                    'POST', '/entries', {'employee_name': 'Jo'})[0], 400)
+                status, page = request(
+                    'GET', '/search/time_spent_range?minutes=%3E4')
+                self.assertEqual([e['id'] for e in page['entries']], [2])
+                self.assertEqual(request(
+                    'GET', '/search/time_spent_range?minutes=6-5')[0], 400)
+
+                # Database errors are answered, the connection kept alive
+                with patch('work_log_db.get_entry', side_effect=(
+                        OperationalError('database is locked'))):
+                    status, error = request('GET', '/entries/2')
+                self.assertEqual(status, 500)
+                self.assertEqual(error['error'], 'database is locked')
+                self.assertEqual(request('GET', '/entries/2')[0], 200)
+
+                results = load_generator.run_load(
+                    *server.server_address[:2], connections=2, duration=0.5)
+                self.assertGreater(results['all']['requests'], 0)
+                self.assertEqual(results['all']['errors'], 0)
+            finally:
+                connection.close()
+                server.shutdown()
+                server.server_close()
+                thread.join()
+                work_log_db.disable_pool()
+
+    def test_server_idle_timeout(self):
+        """Test an idle kept alive connection hands its worker back after
+        the idle timeout
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            work_log_db.configure_pool(os.path.join(directory, 'idle.db'))
+            server = work_log_server.make_server(port=0, workers=1)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            idle = http.client.HTTPConnection(*server.server_address[:2])
+            busy = http.client.HTTPConnection(
+                *server.server_address[:2], timeout=10)
+            try:
+                with patch.multiple(work_log_server.WorkLogHandler,
+                                    timeout=0.2, quiet=True):
+                    idle.request('GET', '/entries/1')
+                    self.assertEqual(idle.getresponse().status, 404)
+                    busy.request('GET', '/entries/1')
+                    self.assertEqual(busy.getresponse().status, 404)
+            finally:
+                idle.close()
+                busy.close()
+                server.shutdown()
+                server.server_close()
+                thread.join()
+                work_log_db.disable_pool()
+
+    def test_time_totals(self):
+        """Test daily totals follow adds, edits and deletes"""
+        first, last = datetime.date(2019, 1, 1), datetime.date(2019, 12, 31)
+
+        def summed_from_entry():
+            work_log_db.rebuild_daily_totals()
+            return work_log_db.time_totals(first, last)
+
+        work_log_db.migrate()
+        for log_entry in [self.log_entry_3, self.log_entry_4,
+                          self.log_entry_5, self.log_entry_dr_3,
+                          self.log_entry_dr_3]:
+            work_log_db.add_entry(log_entry)
+        totals = work_log_db.time_totals(first, last)
+        self.assertEqual(totals, summed_from_entry())
+        self.assertIn({
+            'employee_name': 'John Smith',
+            'period': self.date_dr_3,
+            'total_minutes': 10,
+            'entries': 2,
+        }, totals)
+
+        # Moving, editing and deleting entries keeps the totals in step
+        john = work_log_db.exact_date_search(self.date_dr_3)
+        john = [entry for entry in john
+                if entry['employee_name'] == 'John Smith']
+        work_log_db.edit_entry(john[0], dict(self.log_entry_3, time_spent=7))
+        work_log_db.delete_entry(john[1])
+        totals = work_log_db.time_totals(first, last)
+        self.assertEqual(totals, summed_from_entry())
+        self.assertNotIn('John Smith',
+                         [total['employee_name'] for total in totals])
+
+        # Weekly totals for one employee, 2019/4/3 and 4/4 share a week
+        self.assertEqual(
+            work_log_db.time_totals(
+                first, last, 'Larry Appleton', period='week'), [{
+                    'employee_name': 'Larry Appleton',
+                    'period': datetime.date(2019, 4, 1),
+                    'total_minutes': 37,
+                    'entries': 3,
+                }])
+        self.assertEqual(
+            work_log_db.time_totals(first, last, period=None)[0]['period'],
+            None)
+
+    def test_time_totals_without_summary(self):
+        """Test totals are summed from entry without daily_total"""
+        work_log_db.add_entry(self.log_entry_3)
+        work_log_db.add_entry(self.log_entry_4)
+        test_database.drop_tables([work_log_db.DailyTotal])
+        self.assertEqual(
+            work_log_db.time_totals(
+                self.date_4, self.date_3, period='month'), [{
+                    'employee_name': 'Larry Appleton',
+                    'period': datetime.date(2019, 4, 1),
+                    'total_minutes': 30,
+                    'entries': 2,
+                }])
+        self.assertEqual(
+            work_log_db.time_totals(
+                self.date_4, self.date_3, 'Larry Appleton', None), [{
+                    'employee_name': 'Larry Appleton',
+                    'period': None,
+                    'total_minutes': 30,
+                    'entries': 2,
+                }])
+
     # Above was work_log_db.py testing and below is work_log.py testing
     # All methods that end in ui are testing the ui
 
@@ -630,38 +1771,67 @@ class WorkLogUITests(unittest.TestCase):
 
     def test_get_list_of_ui(self):
         """Test get_list_of function"""
-        # Test when matches input into get_list_of is []
+        # Test when there are no values to choose from
         input_args = []
 
         with patch('builtins.input', side_effect=input_args) as mock:
-            matches = []
-            result = work_log.get_list_of('employee_name', matches)
+            result = work_log.get_list_of([])
 
-            # Assert that get_list_of returns []
-            self.assertEqual(result, [])
+            # Assert that get_list_of returns None
+            self.assertIsNone(result)
 
-            # Test with matches present
-            input_args = [
-                'q',  # invalid input - choices are 1 or 2
-                '',  # enter to continue
-                '2',  # enter valid choice
-            ]
-
-            with patch('builtins.input', side_effect=input_args) as mock:
-                matches = [
-                    self.log_entry_3,
-                    self.log_entry_4,
-                    self.log_entry_5,
-                ]
-                # Will only have entries for Larry Appleton which
-                # are log entry 3 and 4
-                result = work_log.get_list_of('employee_name', matches)
+        # Test with values present
+        for log_entry in [self.log_entry_3, self.log_entry_4,
+                          self.log_entry_5]:
+            work_log_db.add_entry(log_entry)
+        names = work_log_db.distinct_values('employee_name',
+                                            employee_name='larry')
+        self.assertEqual(names, [('Larry Apple', 1), ('Larry Appleton', 2)])
 
-                # Assert first entry in result equals log entry 3
-                self.assertEqual(result[0], self.log_entry_3)
+        input_args = [
+            'q',  # invalid input - choices are 1 or 2
+            '',  # enter to continue
+            '3',  # not in the list
+            '',  # enter to continue
+            '2',  # enter valid choice
+        ]
+        with patch('builtins.input', side_effect=input_args) as mock:
+            self.assertEqual(work_log.get_list_of(names), 'Larry Appleton')
 
-                # Assert second entry equals log entry 4
-                self.assertEqual(result[1], self.log_entry_4)
+    def test_distinct_values(self):
+        """Test the values pickers list are counted in SQLite"""
+        for log_entry in [self.log_entry_3, self.log_entry_4,
+                          self.log_entry_4, self.log_entry_5]:
+            work_log_db.add_entry(log_entry)
+        self.assertEqual(
+            work_log_db.distinct_values(
+                'date', date_range=(self.date_5, self.date_4)),
+            [(self.date_5, 1), (self.date_4, 2)])
+        self.assertEqual(
+            work_log_db.distinct_values(
+                'employee_name', employee_name='appleton',
+                employee_match='substring'), [('Larry Appleton', 3)])
+
+        # Only the picked value's entries are fetched
+        with patch('builtins.input', side_effect=[
+                'b',  # range of dates
+                '2019/4/2',  # enter date 1
+                '2019/4/3',  # enter date 2
+                '2',  # 2019-04-03
+                'r',  # return to search menu
+                'e',  # employee name
+                'larry',  # enter employee name
+                '2',  # Larry Appleton
+                'r',  # return to search menu
+                'f',  # quit search
+        ]), patch('work_log.search_navigator',
+                  wraps=work_log.search_navigator) as navigator:
+            work_log.search_menu_loop()
+        by_date, by_name = [call.args[0] for call in navigator.call_args_list]
+        self.assertEqual([entry['date'] for entry in by_date],
+                         [self.date_4, self.date_4])
+        self.assertEqual([entry['date'] for entry in by_name],
+                         [self.date_3, self.date_4, self.date_4])
 
     def test_add_entry_ui(self):
         """Test add_entry in work_log.py - the ui"""
@@ -695,7 +1865,7 @@ class WorkLogUITests(unittest.TestCase):
             ]
             with patch('builtins.input', side_effect=input_args) as mock:
                 result = work_log.add_entry()
-                self.assertEqual(result, self.log_entry)
+                self.assertEqual(result, dict(self.log_entry, id=1))
 
     def test_edit_entry_ui(self):
         """Test edit_entry in work_log.py - the ui"""
@@ -714,8 +1884,8 @@ class WorkLogUITests(unittest.TestCase):
 
         with patch('builtins.input', side_effect=input_args) as mock:
             entry_list = [
-                self.log_entry,
-                self.new_log_entry,
+                dict(self.log_entry, id=1),
+                dict(self.new_log_entry, id=2),
             ]
             result = work_log.edit_entry(entry_list, count=0)
 
@@ -736,16 +1906,17 @@ class WorkLogUITests(unittest.TestCase):
 
             with patch('builtins.input', side_effect=input_args) as mock:
                 entry_list = [
-                    self.log_entry,
-                    self.new_log_entry,
+                    dict(self.log_entry, id=1),
+                    dict(self.new_log_entry, id=2),
                 ]
                 result = work_log.edit_entry(entry_list, count=0)
 
                 log_entry_for_edit = {
+                    'id': 1,
                     'employee_name': 'Jill Peterson',
                     'date': datetime.date(2019, 4, 4),
                     'task_name': 'edited task',
-                    'time_spent': '30',
+                    'time_spent': 30,
                     'optional_notes': 'optional note',
                 }
 
@@ -764,7 +1935,7 @@ class WorkLogUITests(unittest.TestCase):
 
         with patch('builtins.input', side_effect=input_args) as mock:
             item_to_delete = [
-                self.log_entry
+                dict(self.log_entry, id=1)
             ]
 
             result = work_log.delete_entry(item_to_delete, count=0)
@@ -779,7 +1950,7 @@ class WorkLogUITests(unittest.TestCase):
 
             with patch('builtins.input', side_effect=input_args) as mock:
                 item_to_delete = [
-                    self.log_entry
+                    dict(self.log_entry, id=1)
                 ]
 
                 result = work_log.delete_entry(item_to_delete, count=0)
@@ -789,6 +1960,48 @@ class WorkLogUITests(unittest.TestCase):
 
     # The below is integration testing
 
+    def test_cli(self):
+        """Test the scripted commands add, search, edit, report, delete"""
+        def run(*argv):
+            with patch('sys.stdout', new_callable=io.StringIO) as output:
+                status = work_log_cli.main(list(argv))
+            return status, output.getvalue().splitlines()
+
+        status, lines = run(
+            'add', '--name', self.employee_name, '--date', '2019/03/20',
+            '--task', self.task_name, '--minutes', '5', '--notes', 'a\tb')
+        self.assertEqual(status, 0)
+        self.assertEqual(lines, [
+            'id\temployee_name\tdate\ttask_name\ttime_spent\t'
+            'optional_notes',
+            '1\tJohn Smith\t2019-03-20\ttest add entry\t5\ta\\tb',
+        ])
+
+        work_log_db.add_entry(self.log_entry_3)
+        status, lines = run('search', '--term', 'entry', '--format', 'json')
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines], [2, 1])
+
+        status, lines = run('edit', '--id', '1', '--minutes', '30')
+        self.assertEqual(lines[1].split('\t')[4], '30')
+        self.assertEqual(Entry.get_by_id(1).time_spent, 30)
+
+        status, lines = run('report', '2019/03/01', '2019/04/30',
+                            '--by', 'total', '--format', 'json')
+        self.assertEqual(
+            [json.loads(line)['total_minutes'] for line in lines], [30, 15])
+
+        status, lines = run('delete', '--id', '1')
+        self.assertEqual(status, 0)
+        self.assertEqual(Entry.select().count(), 1)
+
+        # Missing entries and invalid arguments fail
+        with patch('sys.stderr', new_callable=io.StringIO):
+            self.assertEqual(run('delete', '--id', '1')[0], 1)
+            with self.assertRaises(SystemExit):
+                run('add', '--name', '', '--date', '2019/03/20',
+                    '--task', self.task_name, '--minutes', '5')
+
     def test_integration_test_1(self):
         """Test main menu loop, search menu loop, exact date search,
         date range search, time spent search, exact search,
@@ -975,6 +2188,59 @@ class WorkLogUITests(unittest.TestCase):
         with patch('builtins.input', side_effect=input_args) as mock:
             work_log.main_menu_loop()
 
+    def test_search_navigator_long_session(self):
+        """Test paging through more results than the recursion limit, and
+        jumping to the first, last and a numbered result
+        """
+        results = [dict(self.log_entry, id=number)
+                   for number in range(1, 1501)]
+        input_args = ['n'] * 1499 + [
+            'n',  # invalid input - already on the last result
+            '',  # enter to continue
+            'f',  # first result
+            'p',  # invalid input - already on the first result
+            '',  # enter to continue
+            '750',  # jump to result 750
+            'l',  # last result
+            '1501',  # invalid input - there are 1500 results
+            '',  # enter to continue
+            '1',  # jump to result 1
+            'r',  # return to search menu
+        ]
+        shown = []
+
+        def print_navigator_template(navigator_template, list, count,
+                                     template):
+            shown.append(list[count]['id'])
+
+        with patch('builtins.input', side_effect=input_args), \
+                patch('work_log.clear_screen'), \
+                patch('work_log.print_navigator_template',
+                      side_effect=print_navigator_template):
+            work_log.search_navigator(results, count=0)
+
+        self.assertEqual(shown[1499:], [1500, 1500, 1, 1, 750, 1500, 1500, 1])
+
+    def test_screen_single_write(self):
+        """Test a terminal screen is cleared with ANSI escapes and shown in
+        one write, without running a clear process
+        """
+        screen = work_log.Screen()
+        output = io.StringIO()
+        with patch.object(work_log.Screen, 'is_terminal', return_value=True), \
+                patch('work_log.system') as system, \
+                patch('sys.stdout', output), \
+                patch.object(output, 'write', wraps=output.write) as write:
+            screen.write('stale')
+            screen.clear()
+            screen.write('Employee: John Smith\n')
+            screen.write('Result 1 of 1\n')
+            screen.flush()
+
+        system.assert_not_called()
+        write.assert_called_once_with(
+            work_log.Screen.CLEAR + 'Employee: John Smith\nResult 1 of 1\n')
+
     def tearDown(self):
         test_database.drop_tables([Entry])
         test_database.close()
@@ -8,110 +8,282 @@ search, edit, and delete existing entries.
 This file handles the UI while work_log_db handles the database logic
 """
 from collections import OrderedDict
-from os import system, name
+from os import environ, system, name
 from textwrap import dedent
+import atexit
 import datetime
-import work_log_db
+import sys
+import time
+
+# The startup profile times this module from here, the standard library
+# modules above take a few hundred microseconds at most
+_import_started = time.perf_counter()
+
+
+class LazyDatabase:
+    """Stands in for the work_log_db module until it's first used
+
+    Importing peewee and work_log_db, connecting and checking the schema
+    are put off until the first database operation, so the menu and
+    commands that fail argument checks don't wait for them. With
+    auto_initialize set, the first use also runs work_log_db.initialize()
+    and, if WORK_LOG_CACHE is set, enables the search cache and if
+    WORK_LOG_SLOW_QUERY_LOG names a file, appends slow database calls to
+    it.
+    """
+    def __init__(self):
+        self.auto_initialize = False
+        self.timings = OrderedDict()
+        self._module = None
+
+    def load(self):
+        """Import work_log_db, initializing it if requested, and return it"""
+        if self._module is None:
+            started = time.perf_counter()
+            import work_log_db
+            self.timings['import work_log_db and peewee'] = (
+                time.perf_counter() - started)
+            if self.auto_initialize:
+                database = work_log_db.Entry._meta.database
+                started = time.perf_counter()
+                database.connect(reuse_if_open=True)
+                self.timings['connect'] = time.perf_counter() - started
+                started = time.perf_counter()
+                work_log_db.initialize()
+                self.timings['schema check'] = time.perf_counter() - started
+                if environ.get('WORK_LOG_CACHE'):
+                    work_log_db.enable_cache()
+                if environ.get('WORK_LOG_SLOW_QUERY_LOG'):
+                    slow_log = open(environ['WORK_LOG_SLOW_QUERY_LOG'], 'a')
+                    atexit.register(slow_log.close)
+                    work_log_db.enable_query_timing(slow_log=slow_log)
+            self._module = work_log_db
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+
+work_log_db = LazyDatabase()
+
+
+class Screen:
+    """Collects what is shown between prompts so each screen reaches the
+    terminal in one write
+
+    On a terminal the screen is cleared with ANSI escape sequences queued
+    in front of the next screen, instead of running a clear process for
+    every prompt. Elsewhere, such as when output is redirected, it falls
+    back to the cls or clear command.
+    """
+    # Move home, clear the screen and its scrollback
+    CLEAR = '\033[H\033[2J\033[3J'
+
+    def __init__(self):
+        self._buffer = []
+
+    @staticmethod
+    def is_terminal():
+        """Return True if stdout is a terminal that understands ANSI"""
+        return name != 'nt' and sys.stdout.isatty()
+
+    def clear(self):
+        """Clear the screen before whatever is shown next"""
+        if self.is_terminal():
+            # Anything still buffered would be wiped straight away
+            self._buffer = [self.CLEAR]
+        else:
+            self.flush()
+            system('cls' if name == 'nt' else 'clear')
+
+    def write(self, text):
+        """Add text to the screen being built"""
+        self._buffer.append(text)
+
+    def flush(self):
+        """Show the screen built so far with a single write"""
+        if self._buffer:
+            sys.stdout.write(''.join(self._buffer))
+            self._buffer = []
+        sys.stdout.flush()
+
+
+screen = Screen()
 
 
 def clear_screen():
     """Clear the screen"""
-    system('cls' if name == 'nt' else 'clear')
+    screen.clear()
+
+
+def render(*values, sep=' ', end='\n'):
+    """Add values to the screen like print, it's shown by the next prompt"""
+    screen.write(sep.join(str(value) for value in values) + end)
+
+
+def prompt(text=''):
+    """Show the screen built so far, then read a line of input"""
+    screen.flush()
+    return input(text)
+
+
+def validate_employee_name(employee_name):
+    """Return employee_name, ValueError if it isn't a valid name"""
+    if employee_name == '':
+        raise ValueError('An employee name must be entered.')
+    if len(employee_name) > 50:
+        raise ValueError('Must be 50 characters or less.')
+    return employee_name
 
 
 def get_employee_name():
     """Get the employee's full name and return it"""
-    employee_name = ''
-    while employee_name == '':
-        employee_name = input('Please enter name: ')
-        if employee_name != '':
-            if len(employee_name) <= 50:
-                clear_screen()
-                return employee_name
-            else:
-                input('Must be 50 characters or less. Enter to continue')
-                employee_name = ''
-                clear_screen()
-                continue
-        else:
-            input('An employee name must be entered.  Enter to continue')
+    while True:
+        employee_name = prompt('Please enter name: ')
+        try:
+            validate_employee_name(employee_name)
+        except ValueError as error:
+            prompt('{} Enter to continue'.format(error))
             clear_screen()
+            continue
+        clear_screen()
+        return employee_name
 
 
 def invalid_date_error(date_str):
     """Helper method for get_date() and get_2_dates(). Handles invalid dates"""
-    print("Error: {} doesn't seem to be a valid date".format(date_str))
-    input('Press enter to try again')
+    render("Error: {} doesn't seem to be a valid date".format(date_str))
+    prompt('Press enter to try again')
     clear_screen()
 
 
+def parse_date(date_str):
+    """Return the date in a YYYY/MM/DD string, ValueError if invalid"""
+    year, month, day = map(int, date_str.split('/'))
+
+    # prevent a 2 digit year from being entered
+    required_len_year = 4
+    if len(str(year)) != required_len_year:
+        raise ValueError('year must have 4 digits')
+
+    return datetime.date(year, month, day)
+
+
 def get_date(optional_print_statement=None):
     """Gets a valid date from the user and returns it"""
     while True:
         if optional_print_statement:
-            print(optional_print_statement)
-        print('Date of the task')
+            render(optional_print_statement)
+        render('Date of the task')
+        date_str = prompt('Please use YYYY/MM/DD: ')
         try:
-            date_str = input('Please use YYYY/MM/DD: ')
-            year, month, day = map(int, date_str.split('/'))
-
-            # prevent a 2 digit year from being entered
-            required_len_year = 4
-            if len(str(year)) != required_len_year:
-                invalid_date_error(date_str)
-                continue
-
-            date = datetime.date(year, month, day)
-            clear_screen()
-            return date
+            date = parse_date(date_str)
         except ValueError:
             invalid_date_error(date_str)
             continue
+        clear_screen()
+        return date
+
+
+def validate_task_name(task_name):
+    """Return task_name, ValueError if it isn't a valid task name"""
+    if task_name == '':
+        raise ValueError('A task name must be entered.')
+    if len(task_name) > 50:
+        raise ValueError('Must be 50 characters or less.')
+    return task_name
 
 
 def get_task_name():
     """Gets a task_name from the user and returns it"""
-
-    task_name = ''
-    while task_name == '':
-        task_name = input('Title of the task: ')
-        if task_name != '':
-            if len(task_name) <= 50:
-                clear_screen()
-                return task_name
-            else:
-                input('Must be 50 characters or less. Enter to continue')
-                task_name = ''
-                clear_screen()
-                continue
-        else:
-            input('A task name must be entered.  Enter to continue')
+    while True:
+        task_name = prompt('Title of the task: ')
+        try:
+            validate_task_name(task_name)
+        except ValueError as error:
+            prompt('{} Enter to continue'.format(error))
             clear_screen()
+            continue
+        clear_screen()
+        return task_name
+
+
+def parse_time_spent(time_spent):
+    """Return time_spent as a positive integer, ValueError if it isn't"""
+    try:
+        minutes = int(time_spent)
+    except ValueError:
+        raise ValueError(
+            "Error: {} doesn't seem to be a valid integer".format(time_spent))
+    if minutes <= 0:
+        raise ValueError('Time spent must be greater than zero')
+    return minutes
 
 
 def get_time_spent():
     """Gets a valid time spent from the user and returns it"""
     while True:
+        time_spent = prompt('Time spent (rounded minutes): ')
         try:
-            time_spent = input('Time spent (rounded minutes): ')
-            int(time_spent)
+            parse_time_spent(time_spent)
+        except ValueError as error:
+            render(error)
+            prompt('Press enter to try again')
             clear_screen()
-            if int(time_spent) <= 0:
-                print('Time spent must be greater than zero')
-                input('Press enter to try again')
-                continue
-            return time_spent
-        except ValueError:
-            error = "Error: {} doesn't seem to be a valid integer"
-            print(error.format(time_spent))
-            input('Press enter to try again')
+            continue
+        clear_screen()
+        return parse_time_spent(time_spent)
+
+
+def parse_time_spent_range(text):
+    """Return the (minimum, maximum) minutes of text, inclusive and None
+    for no bound, ValueError if invalid
+
+    text is a number of minutes (45), a range (60-240) or a threshold
+    (>480, >=480, <30 or <=30).
+    """
+    text = text.replace(' ', '')
+    thresholds = [
+        ('>=', lambda minutes: (minutes, None)),
+        ('<=', lambda minutes: (None, minutes)),
+        ('>', lambda minutes: (minutes + 1, None)),
+        ('<', lambda minutes: (None, minutes - 1)),
+    ]
+    for operator, bounds in thresholds:
+        if text.startswith(operator):
+            return bounds(parse_time_spent(text[len(operator):]))
+    if '-' in text:
+        minimum, maximum = map(parse_time_spent, text.split('-', 1))
+        if minimum > maximum:
+            raise ValueError(
+                'Error: {} is greater than {}'.format(minimum, maximum))
+        return minimum, maximum
+    minutes = parse_time_spent(text)
+    return minutes, minutes
+
+
+def get_time_spent_range():
+    """Gets minutes, a range or a threshold of time spent from the user
+    and returns it as a (minimum, maximum) pair
+    """
+    while True:
+        render('Time spent in minutes, a range like 60-240 or a threshold '
+               'like >480')
+        text = prompt('Time spent: ')
+        try:
+            time_spent_range = parse_time_spent_range(text)
+        except ValueError as error:
+            render(error)
+            prompt('Press enter to try again')
             clear_screen()
             continue
+        clear_screen()
+        return time_spent_range
 
 
 def get_optional_notes():
     """Gets optional notes from the user and returns it"""
-    optional_notes = input('Notes (Optional, you can leave this empty): ')
+    optional_notes = prompt('Notes (Optional, you can leave this empty): ')
     clear_screen()
     return optional_notes
 
@@ -128,8 +300,8 @@ def get_2_dates():
 
         if date > date_2:
             error = "Error: {} is greater than {}"
-            print(error.format(date, date_2))
-            input('Press enter to try again')
+            render(error.format(date, date_2))
+            prompt('Press enter to try again')
             clear_screen()
             continue
         return date, date_2
@@ -137,54 +309,47 @@ def get_2_dates():
 
 def get_exact_string():
     """Gets and returns an exact text string"""
-    print('Search by string in the task name or optional notes')
-    exact_string = input('String: ')
+    render('Search by string in the task name or optional notes')
+    exact_string = prompt('String: ')
     return exact_string
 
 
-def get_list_of(filter_by, search_results):
+def get_list_of(values):
     """Present user with a list of items which narrows the search
     This is used for the date_range_search and employee_name_search
+
+    values are (item, number of entries) pairs from
+    work_log_db.distinct_values, returns the item chosen, or None if
+    there are none to choose from.
     """
-    # for each entry in the list, print a unique list
-    item_set = set()
     item_dict = OrderedDict()
-    matches = []
     entry_number = 1
 
-    # If search_results is [], return []
-    if search_results == []:
-        return matches
-
-    # Create a unique set
-    for entry in search_results:
-        item_set.add(entry[filter_by])
+    # If there is nothing to choose from, return None
+    if not values:
+        return None
 
     # Create numbered dictionary
-    for item in sorted(item_set):
-        item_dict[entry_number] = item
+    for item, count in values:
+        item_dict[entry_number] = (item, count)
         entry_number += 1
 
     # Allow the user to select by item
     exit_loop = False
     while exit_loop is False:
         try:
-            print('Select one of the following: ')
-            for key, value in item_dict.items():
-                print('{}) {}'.format(key, value))
-            choice = input('>').lower().strip()
-            choice = item_dict[int(choice)]
+            render('Select one of the following: ')
+            for key, (item, count) in item_dict.items():
+                render('{}) {} ({:,})'.format(key, item, count))
+            choice = prompt('>').lower().strip()
+            choice = item_dict[int(choice)][0]
             exit_loop = True
-        except ValueError:
-            print('Enter a valid integer choice from the list')
-            input('Enter to continue')
+        except (ValueError, KeyError):
+            render('Enter a valid integer choice from the list')
+            prompt('Enter to continue')
             clear_screen()
 
-    # Return the list
-    for entry in search_results:
-        if choice == entry[filter_by]:
-            matches.append(entry)
-    return matches
+    return choice
 
 
 def add_entry():
@@ -198,7 +363,7 @@ def add_entry():
     save = None
 
     while save != 'y':
-        save = input('Save entry? [Yn] ').lower()
+        save = prompt('Save entry? [Yn] ').lower()
 
         if save == 'y':
             log_entry = {
@@ -209,14 +374,14 @@ def add_entry():
                 "optional_notes": optional_notes
             }
             entry = work_log_db.add_entry(log_entry)
-            input('Entry added. Enter to return to the menu')
+            prompt('Entry added. Enter to return to the menu')
             return entry
         elif save == 'n':
-            input('Entry not saved. Enter to continue')
+            prompt('Entry not saved. Enter to continue')
             log_entry = {}
             return log_entry
         else:
-            input("Enter a valid choice 'y' or 'n'. Enter to continue")
+            prompt("Enter a valid choice 'y' or 'n'. Enter to continue")
             clear_screen()
             continue
 
@@ -227,23 +392,23 @@ def search_menu_loop():
 
     while choice != 'f':
         clear_screen()
-        print(dedent("""\
+        render(dedent("""\
             Do you want to search by:\
         """))
         for key, value in search_menu.items():
-            print('{}) {}'.format(key, value.__doc__))
+            render('{}) {}'.format(key, value.__doc__))
 
-        choice = input('>').lower().strip()
+        choice = prompt('>').lower().strip()
         if choice in search_menu:
             clear_screen()
             search_menu[choice]()
         else:
-            input('Enter a valid choice a-f. Enter to continue')
+            prompt('Enter a valid choice a-f. Enter to continue')
 
 
 def quit():
     """Quit the program"""
-    print(dedent("""\
+    render(dedent("""\
                 Thanks for using the Work Log program!
                 Come again soon.\
             """))
@@ -253,7 +418,7 @@ def exact_date_search():
     """Exact date"""
     clear_screen()
     date = get_date()
-    matches = work_log_db.exact_date_search(date)
+    matches = work_log_db.exact_date_search(date, lazy=True)
     search_navigator(matches, count=0)
 
 
@@ -261,16 +426,23 @@ def date_range_search():
     """Range of dates"""
     clear_screen()
     date, date_2 = get_2_dates()
-    matches = work_log_db.date_range_search(date, date_2)
-    matches = get_list_of('date', matches)
+    date = get_list_of(
+        work_log_db.distinct_values('date', date_range=(date, date_2)))
+    matches = []
+    if date is not None:
+        matches = work_log_db.exact_date_search(date, lazy=True)
     search_navigator(matches, count=0)
 
 
 def time_spent_search():
     """Time spent"""
     clear_screen()
-    time_spent = get_time_spent()
-    matches = work_log_db.time_spent_search(time_spent)
+    minimum, maximum = get_time_spent_range()
+    if minimum == maximum:
+        matches = work_log_db.time_spent_search(minimum, lazy=True)
+    else:
+        matches = work_log_db.time_spent_range_search(
+            minimum, maximum, lazy=True)
     search_navigator(matches, count=0)
 
 
@@ -278,16 +450,26 @@ def exact_search():
     """Exact search"""
     clear_screen()
     exact_string = get_exact_string()
-    matches = work_log_db.exact_search(exact_string)
+    matches = work_log_db.exact_search(exact_string, lazy=True)
     search_navigator(matches, count=0)
 
 
 def employee_name_search():
     """Employee name"""
     clear_screen()
+    render('Enter the start of a name, or * and any part of one')
     employee_name = get_employee_name()
-    matches = work_log_db.employee_name_search(employee_name)
-    matches = get_list_of('employee_name', matches)
+    mode = 'prefix'
+    if employee_name.startswith('*'):
+        employee_name, mode = employee_name[1:], 'substring'
+    names = work_log_db.distinct_values(
+        'employee_name', employee_name=employee_name, employee_match=mode)
+    render('{} match, {:,} employees'.format(mode.capitalize(), len(names)))
+    employee_name = get_list_of(names)
+    matches = []
+    if employee_name is not None:
+        matches = work_log_db.employee_name_search(
+            employee_name, 'exact', lazy=True)
     search_navigator(matches, count=0)
 
 
@@ -303,24 +485,25 @@ def main_menu_loop():
 
     while choice != 'c':
         clear_screen()
-        print(dedent("""\
+        render(dedent("""\
             WORK LOG
             What would you like to do?\
         """))
         for key, value in main_menu.items():
-            print('{}) {}'.format(key, value.__doc__))
-        choice = input('>').lower().strip()
+            render('{}) {}'.format(key, value.__doc__))
+        choice = prompt('>').lower().strip()
 
         if choice in main_menu:
             clear_screen()
             main_menu[choice]()
         else:
-            input("Please enter 'a', 'b', or 'c'\nEnter to continue")
+            prompt("Please enter 'a', 'b', or 'c'\nEnter to continue")
+    screen.flush()
 
 
 def print_navigator_template(navigator_template, list, count, template):
     """Helper function for search_navigator. Prints navigator template"""
-    print(navigator_template.format(
+    render(navigator_template.format(
             list[count]["employee_name"], list[count]["date"],
             list[count]["task_name"], list[count]["time_spent"],
             list[count]["optional_notes"], count+1, len(list)
@@ -340,7 +523,7 @@ def edit_entry(list, count):
     save = None
 
     while save != 'y':
-        save = input('Save entry? [Yn] ').lower()
+        save = prompt('Save entry? [Yn] ').lower()
 
         if save == 'y':
             modification = {
@@ -357,13 +540,13 @@ def edit_entry(list, count):
                 list[count]['{}'.format(item)] = modification[
                     '{}'.format(item)]
 
-            input('The entry has been edited. Press enter')
+            prompt('The entry has been edited. Press enter')
             return list
         elif save == 'n':
-            input('Entry not saved')
+            prompt('Entry not saved')
             return list
         else:
-            input("Enter a valid choice 'y' or 'n'. Enter to continue")
+            prompt("Enter a valid choice 'y' or 'n'. Enter to continue")
             clear_screen()
             continue
 
@@ -374,192 +557,107 @@ def delete_entry(list, count):
 
     while delete != 'y':
         clear_screen()
-        delete = input('Delete entry? [Yn] ').lower()
+        delete = prompt('Delete entry? [Yn] ').lower()
 
         if delete == 'y':
             work_log_db.delete_entry(dict(list[count]))
             del list[count]
-            input('The entry has been deleted. Press enter')
+            prompt('The entry has been deleted. Press enter')
             return list
         elif delete == 'n':
-            input('Entry not deleted')
+            prompt('Entry not deleted')
             return list
         else:
-            input("Enter a valid choice 'y' or 'n'. Enter to continue")
+            prompt("Enter a valid choice 'y' or 'n'. Enter to continue")
             continue
 
 
+navigator_template = dedent("""\
+    Employee Name: {},
+    Date: {},
+    Title: {},
+    Time Spent: {},
+    Notes: {},\n
+    Result {} of {}\n
+""")
+
+
+def navigator_choices(list, count):
+    """Helper function for search_navigator. Returns the choices available
+    at result count as an OrderedDict of key to label
+    """
+    choices = OrderedDict()
+    if count + 1 < len(list):
+        choices['n'] = '[N]ext'
+    if count > 0:
+        choices['p'] = '[P]revious'
+    if len(list) > 1:
+        choices['f'] = '[F]irst'
+        choices['l'] = '[L]ast'
+    choices['e'] = '[E]dit'
+    choices['d'] = '[D]elete'
+    choices['r'] = '[R]eturn to search menu'
+    return choices
+
+
 def search_navigator(list, count):
     """
-    Allows the user to navigate through entries found, edit entries,
-    delete entries, and to return to the search menu
+    Allows the user to navigate through entries found, jump to an entry by
+    its number, edit entries, delete entries, and to return to the search
+    menu
+
+    Each keystroke moves a single loop to its next state, so long sessions
+    use constant stack space.
     """
     clear_screen()
 
-    navigator_template = dedent("""\
-        Employee Name: {},
-        Date: {},
-        Title: {},
-        Time Spent: {},
-        Notes: {},\n
-        Result {} of {}\n
-    """)
-
-    e_d_r_template = '[E]dit, [D]elete, [R]eturn to search menu'
-    n_e_d_r_template = '[N]ext, [E]dit, [D]elete, [R]eturn to search menu'
-    p_e_d_r_template = '[P]revious, [E]dit, [D]elete, [R]eturn to search menu'
-    n_p_e_d_r_template = dedent("""\
-        [N]ext, [P]revious, [E]dit, [D]elete, [R]eturn to search menu\
-    """)
-
-    # List is length 0 - there are no matches found or left
-    if len(list) == 0:
-        no_matches = 'No matches found\nPress enter to continue'
-        input(no_matches)
+    while True:
+        # List is length 0 - there are no matches found or left
+        if len(list) == 0:
+            no_matches = 'No matches found\nPress enter to continue'
+            prompt(no_matches)
+            clear_screen()
+            return
+
+        choices = navigator_choices(list, count)
+        template = ', '.join(choices.values())
+        if len(list) > 1:
+            template += '\nOr a result number 1-{} to jump to it'.format(
+                len(list))
+        print_navigator_template(navigator_template, list, count, template)
+
+        choice = prompt('>').lower().strip()
+
+        if choice not in choices and not (
+                choice.isdigit() and 1 <= int(choice) <= len(list)):
+            keys = ["'{}'".format(key) for key in choices]
+            error = dedent("""\
+            Please enter {} or {}
+            Enter to continue""").format(', '.join(keys[:-1]), keys[-1])
+            prompt(error)
+            clear_screen()
+            continue
+
+        if choice == 'n':
+            count += 1
+        elif choice == 'p':
+            count -= 1
+        elif choice == 'f':
+            count = 0
+        elif choice == 'l':
+            count = len(list) - 1
+        elif choice == 'e':
+            list = edit_entry(list, count)
+        elif choice == 'd':
+            list = delete_entry(list, count)
+            # Deleting the last result moves back to the new last result
+            count = max(0, min(count, len(list) - 1))
+        elif choice == 'r':
+            clear_screen()
+            return
+        else:
+            count = int(choice) - 1
         clear_screen()
-    # List is length 1 - there is 1 match found or left
-    elif len(list) == 1:
-        is_valid = False
-        while is_valid is False:
-            print_navigator_template(
-                navigator_template,
-                list, count,
-                e_d_r_template
-            )
-
-            choice = input('>')
-
-            if choice.lower() == 'e':
-                is_valid = True
-                list = edit_entry(list, count)
-                search_navigator(list, count)
-                clear_screen()
-            elif choice.lower() == 'd':
-                is_valid = True
-                list = delete_entry(list, count)
-                search_navigator(list, count)
-                clear_screen()
-            elif choice.lower() == 'r':
-                is_valid = True
-                clear_screen()
-            else:
-                error = dedent("""\
-                Please enter 'e', 'd' or 'r'
-                Enter to continue""")
-                input(error)
-                clear_screen()
-    # The list has 2 or more entries and this is the first list item
-    elif count == 0:
-        is_valid = False
-        while is_valid is False:
-            print_navigator_template(
-                navigator_template,
-                list,
-                count,
-                n_e_d_r_template
-            )
-
-            choice = input('>')
-
-            if choice.lower() == 'n':
-                is_valid = True
-                count += 1
-                search_navigator(list, count)
-            elif choice.lower() == 'e':
-                is_valid = True
-                list = edit_entry(list, count)
-                search_navigator(list, count)
-                clear_screen()
-            elif choice.lower() == 'd':
-                is_valid = True
-                list = delete_entry(list, count)
-                search_navigator(list, count)
-                clear_screen()
-            elif choice.lower() == 'r':
-                is_valid = True
-                clear_screen()
-            else:
-                error = dedent("""\
-                Please enter 'n', 'e', 'd' or 'r'
-                Enter to continue""")
-                input(error)
-                clear_screen()
-    # This is the last item in the list
-    elif count+1 == len(list):
-        is_valid = False
-        while is_valid is False:
-            print_navigator_template(
-                navigator_template,
-                list,
-                count,
-                p_e_d_r_template
-            )
-
-            choice = input('>')
-
-            if choice.lower() == 'p':
-                is_valid = True
-                count -= 1
-                search_navigator(list, count)
-            elif choice.lower() == 'e':
-                is_valid = True
-                list = edit_entry(list, count)
-                search_navigator(list, count)
-                clear_screen()
-            elif choice.lower() == 'd':
-                is_valid = True
-                list = delete_entry(list, count)
-                search_navigator(list, count-1)
-                clear_screen()
-            elif choice.lower() == 'r':
-                is_valid = True
-                clear_screen()
-            else:
-                error = dedent("""\
-                Please enter 'p', 'e', 'd' or 'r'
-                Enter to continue""")
-                input(error)
-                clear_screen()
-    # List items between the first and last list items
-    else:
-        is_valid = False
-        while is_valid is False:
-            print_navigator_template(
-                navigator_template,
-                list,
-                count,
-                n_p_e_d_r_template
-            )
-
-            choice = input('>')
-
-            if choice.lower() == 'n':
-                is_valid = True
-                count += 1
-                search_navigator(list, count)
-            elif choice.lower() == 'p':
-                is_valid = True
-                count -= 1
-                search_navigator(list, count)
-            elif choice.lower() == 'e':
-                is_valid = True
-                list = edit_entry(list, count)
-                search_navigator(list, count)
-                clear_screen()
-            elif choice.lower() == 'd':
-                is_valid = True
-                list = delete_entry(list, count)
-                search_navigator(list, count)
-                clear_screen()
-            elif choice.lower() == 'r':
-                is_valid = True
-                clear_screen()
-            else:
-                error = dedent("""\
-                Please enter 'n', 'p', 'e', 'd' or 'r'
-                Enter to continue""")
-                input(error)
-                clear_screen()
 
 
 main_menu = OrderedDict([
@@ -577,6 +675,37 @@ search_menu = OrderedDict([
         ('f', quit_search),
     ])
 
-if __name__ == '__main__':
-    work_log_db.initialize()
+
+def print_startup_profile(started=_import_started):
+    """Print how long starting up took, step by step, to stderr"""
+    steps = OrderedDict([('import work_log', _imported - started)])
+    steps.update(work_log_db.timings)
+    print('startup profile', file=sys.stderr)
+    for step, seconds in steps.items():
+        print('  {:<32}{:>9.1f} ms'.format(step, seconds * 1000),
+              file=sys.stderr)
+    print('  {:<32}{:>9.1f} ms'.format('total', sum(steps.values()) * 1000),
+          file=sys.stderr)
+
+
+def main(argv):
+    """Run the scripted command in argv, or the menus if there isn't one"""
+    if '--startup-profile' in argv:
+        argv = [arg for arg in argv if arg != '--startup-profile']
+        atexit.register(print_startup_profile)
+    work_log_db.auto_initialize = True
+    if argv:
+        # Scripted commands skip the menus entirely
+        import work_log_cli
+        return work_log_cli.main(argv)
     main_menu_loop()
+    return 0
+
+
+_imported = time.perf_counter()
+
+if __name__ == '__main__':
+    # Make this the work_log module work_log_cli imports rather than have
+    # it load a second copy, so they share the database and its timings
+    sys.modules.setdefault('work_log', sys.modules[__name__])
+    sys.exit(main(sys.argv[1:]))
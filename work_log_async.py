@@ -0,0 +1,169 @@
+"""
+asyncio API for work_log_db
+
+The work_log_db functions are blocking peewee calls, AsyncWorkLog runs them
+on threads so they don't stall the event loop: searches on a bounded pool
+of reader threads and writes, one at a time, on a dedicated writer thread.
+Set up work_log_db.configure_pool() first so the readers each get their own
+connection and, with WAL, never wait for the writer.
+
+    async with work_log_async.AsyncWorkLog(readers=8) as work_log:
+        entry = await work_log.add_entry(log_entry)
+        matches = await work_log.exact_search('report')
+        async with contextlib.aclosing(
+                work_log.iter_entries(employee_name='John')) as rows:
+            async for row in rows:
+                ...
+"""
+import asyncio
+import contextlib
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from peewee import chunked
+import work_log_db
+
+
+class _End:
+    """Marks the end of the batches of iter_entries, holding the error
+    that ended them if any
+    """
+    def __init__(self, error=None):
+        self.error = error
+
+
+class AsyncWorkLog:
+    """Awaitable versions of the work_log_db functions"""
+    def __init__(self, readers=4):
+        self._readers = ThreadPoolExecutor(
+            max_workers=readers, thread_name_prefix='work_log_reader')
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='work_log_writer')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop the threads once the queries already submitted finish"""
+        self._readers.shutdown(wait=False)
+        self._writer.shutdown(wait=False)
+
+    def _run(self, executor, function, *args, **kwargs):
+        """Return a future for function(*args, **kwargs) run on executor"""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(
+            executor, functools.partial(function, *args, **kwargs))
+
+    def _read(self, function, *args, **kwargs):
+        return self._run(self._readers, function, *args, **kwargs)
+
+    def _write(self, function, *args, **kwargs):
+        return self._run(self._writer, function, *args, **kwargs)
+
+    async def add_entry(self, log_entry):
+        """Add entry to database, returns it with the id it was given"""
+        return await self._write(work_log_db.add_entry, log_entry)
+
+    async def add_entries(self, log_entries, batch_size=1000):
+        """Add many entries, returns the number added"""
+        return await self._write(
+            work_log_db.add_entries, log_entries, batch_size)
+
+    async def edit_entry(self, old_entry, new_entry):
+        """Edit entry, found by the id from its search result"""
+        return await self._write(work_log_db.edit_entry, old_entry, new_entry)
+
+    async def delete_entry(self, entry):
+        """Delete entry, found by the id from its search result"""
+        return await self._write(work_log_db.delete_entry, entry)
+
+    async def get_entry(self, entry_id):
+        """Return the entry with entry_id as a SearchRow, or None"""
+        return await self._read(work_log_db.get_entry, entry_id)
+
+    async def exact_date_search(self, date):
+        """Search database by exact date"""
+        return await self._read(work_log_db.exact_date_search, date)
+
+    async def date_range_search(self, date, date_2):
+        """Search database by range of dates"""
+        return await self._read(work_log_db.date_range_search, date, date_2)
+
+    async def time_spent_search(self, time_spent):
+        """Search database by time spent"""
+        return await self._read(work_log_db.time_spent_search, time_spent)
+
+    async def time_spent_range_search(self, minimum=None, maximum=None):
+        """Search database by a range of time spent, None for no bound"""
+        return await self._read(
+            work_log_db.time_spent_range_search, minimum, maximum)
+
+    async def exact_search(self, exact_string, full_text=True):
+        """Search task_name and optional_notes by exact string"""
+        return await self._read(
+            work_log_db.exact_search, exact_string, full_text=full_text)
+
+    async def employee_name_search(self, employee_name, mode='prefix'):
+        """Search database by employee name, mode as for
+        work_log_db.employee_name_search
+        """
+        return await self._read(
+            work_log_db.employee_name_search, employee_name, mode)
+
+    async def time_totals(self, first_date, last_date, employee_name=None,
+                          period='day'):
+        """Return the totals of work_log_db.time_totals"""
+        return await self._read(
+            work_log_db.time_totals, first_date, last_date, employee_name,
+            period)
+
+    async def iter_entries(self, batch_size=500, **criteria):
+        """Yield a tuple of work_log_db.ENTRY_COLUMNS for each entry
+        matching criteria, newest first
+
+        One reader thread streams the rows for the whole iteration, handing
+        them over batch_size at a time and staying at most two batches
+        ahead, so memory use doesn't grow with the number of matches.
+        Wrap it in contextlib.aclosing() if the loop may stop early, the
+        reader is only handed back once the iterator is closed.
+        """
+        loop = asyncio.get_running_loop()
+        batches = asyncio.Queue(maxsize=2)
+        stopped = threading.Event()
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(batches.put(item), loop).result()
+
+        def produce():
+            error = None
+            try:
+                rows = work_log_db.iter_entries(**criteria)
+                with contextlib.closing(rows):
+                    for batch in chunked(rows, batch_size):
+                        if stopped.is_set():
+                            break
+                        put(batch)
+            except Exception as exception:
+                error = exception
+            put(_End(error))
+
+        producer = self._read(produce)
+        batch = None
+        try:
+            while True:
+                batch = await batches.get()
+                if isinstance(batch, _End):
+                    if batch.error is not None:
+                        raise batch.error
+                    break
+                for row in batch:
+                    yield row
+        finally:
+            # Let the reader finish if iteration stopped early
+            stopped.set()
+            while not isinstance(batch, _End):
+                batch = await batches.get()
+            await producer
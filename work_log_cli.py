@@ -0,0 +1,215 @@
+"""
+Non-interactive commands for scripts, cron jobs and shell pipelines
+
+Each command validates its arguments with the same rules as the prompts
+in work_log.py, calls work_log_db once and prints tab-separated values
+(with a header line) or JSON lines.
+
+    python3 work_log.py add --name "John Smith" --date 2019/03/20 \\
+        --task "Weekly report" --minutes 45
+    python3 work_log.py search --employee John --range 2019/03/01 2019/03/31
+    python3 work_log.py search --minutes '>480'
+    python3 work_log.py edit --id 12 --minutes 60
+    python3 work_log.py delete --id 12
+    python3 work_log.py report 2019/03/01 2019/03/31 --by week --format json
+"""
+import argparse
+import itertools
+import json
+import sys
+import work_log
+from work_log import work_log_db
+
+REPORT_COLUMNS = ('period', 'employee_name', 'total_minutes', 'entries')
+
+
+def _tsv_value(value):
+    """Format a value for a TSV cell, escaping tabs and line breaks"""
+    if value is None:
+        return ''
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace(
+        '\n', '\\n').replace('\r', '\\r')
+
+
+def write_rows(columns, rows, file_format, output=None):
+    """Print rows, tuples in the order of columns, as TSV or JSON lines"""
+    output = output or sys.stdout
+    if file_format == 'tsv':
+        output.write('\t'.join(columns) + '\n')
+        for row in rows:
+            output.write('\t'.join(_tsv_value(value) for value in row) + '\n')
+    else:
+        for row in rows:
+            output.write(json.dumps(dict(zip(columns, row)), default=str))
+            output.write('\n')
+
+
+def _entry_row(entry):
+    """Return a search result as a tuple of ENTRY_COLUMNS"""
+    return tuple(entry[column] for column in work_log_db.ENTRY_COLUMNS)
+
+
+def _checked(validator):
+    """Make validator report ValueErrors as argparse errors"""
+    def check(value):
+        try:
+            return validator(value)
+        except ValueError as error:
+            raise argparse.ArgumentTypeError(str(error))
+    check.__name__ = validator.__name__
+    return check
+
+
+def add(args):
+    """Add an entry"""
+    entry = work_log_db.add_entry({
+        'employee_name': args.name,
+        'date': args.date,
+        'task_name': args.task,
+        'time_spent': args.minutes,
+        'optional_notes': args.notes,
+    })
+    write_rows(work_log_db.ENTRY_COLUMNS, [_entry_row(entry)], args.format)
+    return 0
+
+
+def search(args):
+    """Print the entries matching every given criterion, newest first"""
+    rows = work_log_db.iter_entries(
+        date=args.date,
+        date_range=args.range,
+        employee_name=args.employee,
+        employee_match=args.employee_match,
+        exact_string=args.term,
+        time_spent_range=args.minutes)
+    if args.limit is not None:
+        rows = itertools.islice(rows, args.limit)
+    write_rows(work_log_db.ENTRY_COLUMNS, rows, args.format)
+    return 0
+
+
+def edit(args):
+    """Change the given fields of an entry"""
+    entry = work_log_db.get_entry(args.id)
+    if entry is None:
+        print('No entry with id {}'.format(args.id), file=sys.stderr)
+        return 1
+    changes = {
+        'employee_name': args.name,
+        'date': args.date,
+        'task_name': args.task,
+        'time_spent': args.minutes,
+        'optional_notes': args.notes,
+    }
+    modification = dict(entry)
+    modification.update(
+        (field, value) for field, value in changes.items()
+        if value is not None)
+    work_log_db.edit_entry(entry, modification)
+    write_rows(work_log_db.ENTRY_COLUMNS, [_entry_row(modification)],
+               args.format)
+    return 0
+
+
+def delete(args):
+    """Delete an entry"""
+    entry = work_log_db.get_entry(args.id)
+    if entry is None:
+        print('No entry with id {}'.format(args.id), file=sys.stderr)
+        return 1
+    work_log_db.delete_entry(entry)
+    write_rows(work_log_db.ENTRY_COLUMNS, [_entry_row(entry)], args.format)
+    return 0
+
+
+def report(args):
+    """Print minutes logged per employee per period"""
+    period = None if args.by == 'total' else args.by
+    totals = work_log_db.time_totals(
+        args.first, args.last, args.employee, period)
+    write_rows(REPORT_COLUMNS, [
+        tuple(total[column] for column in REPORT_COLUMNS)
+        for total in totals], args.format)
+    return 0
+
+
+def build_parser():
+    """Return the argument parser for every command"""
+    employee_name = _checked(work_log.validate_employee_name)
+    date = _checked(work_log.parse_date)
+    task_name = _checked(work_log.validate_task_name)
+    minutes = _checked(work_log.parse_time_spent)
+    minutes_range = _checked(work_log.parse_time_spent_range)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--format', choices=['tsv', 'json'], default='tsv',
+                        help='tab-separated values (default) or JSON lines')
+
+    parser = argparse.ArgumentParser(
+        prog='work_log.py',
+        description='Work log commands, run without one for the menu')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('add', parents=[common], help=add.__doc__)
+    command.add_argument('--name', type=employee_name, required=True)
+    command.add_argument('--date', type=date, required=True,
+                         help='YYYY/MM/DD')
+    command.add_argument('--task', type=task_name, required=True)
+    command.add_argument('--minutes', type=minutes, required=True)
+    command.add_argument('--notes', default='')
+    command.set_defaults(func=add)
+
+    command = commands.add_parser(
+        'search', parents=[common], help=search.__doc__)
+    command.add_argument('--date', type=date, help='exact date, YYYY/MM/DD')
+    command.add_argument('--range', nargs=2, type=date,
+                         metavar=('FIRST', 'LAST'), help='range of dates')
+    command.add_argument('--employee',
+                         help='employee name starts with, ignoring case')
+    command.add_argument('--employee-match', default='prefix',
+                         choices=['prefix', 'substring', 'exact'],
+                         help='match --employee at the start of the name '
+                              '(default), anywhere in it or the whole name')
+    command.add_argument('--term',
+                         help='task name or optional notes contain')
+    command.add_argument('--minutes', type=minutes_range,
+                         help='time spent in minutes, a range like 60-240 '
+                              'or a threshold like >480')
+    command.add_argument('--limit', type=int,
+                         help='print at most this many entries')
+    command.set_defaults(func=search)
+
+    command = commands.add_parser('edit', parents=[common], help=edit.__doc__)
+    command.add_argument('--id', type=int, required=True)
+    command.add_argument('--name', type=employee_name)
+    command.add_argument('--date', type=date, help='YYYY/MM/DD')
+    command.add_argument('--task', type=task_name)
+    command.add_argument('--minutes', type=minutes)
+    command.add_argument('--notes')
+    command.set_defaults(func=edit)
+
+    command = commands.add_parser(
+        'delete', parents=[common], help=delete.__doc__)
+    command.add_argument('--id', type=int, required=True)
+    command.set_defaults(func=delete)
+
+    command = commands.add_parser(
+        'report', parents=[common], help=report.__doc__)
+    command.add_argument('first', type=date, help='first date, YYYY/MM/DD')
+    command.add_argument('last', type=date, help='last date, YYYY/MM/DD')
+    command.add_argument('--employee', help='only this employee')
+    command.add_argument('--by', choices=['day', 'week', 'month', 'total'],
+                         default='day', help='period to total by')
+    command.set_defaults(func=report)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    work_log_db.initialize()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,173 +1,2065 @@
 """This file handles the database logic for work_log.py"""
+import configparser
+import contextlib
+import datetime
+import functools
+import heapq
+import inspect
+import os
+import queue
+import reprlib
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from concurrent.futures import Future
 from peewee import *
+from playhouse.pool import PooledSqliteDatabase
 
-db = SqliteDatabase('work_log.db')
+# Connection settings for db, pick one with WORK_LOG_PROFILE or the
+# profile option of the config file
+PRAGMA_PROFILES = {
+    # SQLite's durable defaults, only waiting on locks instead of failing
+    'safe': {
+        'journal_mode': 'delete',
+        'synchronous': 'full',
+        'busy_timeout': 5000,
+    },
+    # WAL lets readers run alongside the writer, and NORMAL only syncs at
+    # checkpoints, a power loss may drop the last commits but can't corrupt
+    'fast': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'cache_size': -64000,  # 64MB, negative sizes are in KiB
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'memory',
+        'busy_timeout': 5000,
+    },
+    # For imports that can be rerun, nothing is synced to disk at all
+    'bulk-load': {
+        'journal_mode': 'wal',
+        'synchronous': 'off',
+        'cache_size': -256000,
+        'mmap_size': 1024 * 1024 * 1024,
+        'temp_store': 'memory',
+        'busy_timeout': 5000,
+    },
+}
+
+DEFAULT_PATH = 'work_log.db'
+DEFAULT_PROFILE = 'safe'
+DEFAULT_CONFIG_FILE = 'work_log.ini'
+
+
+def read_config(environ=os.environ):
+    """Return the database path, profile name and pragma overrides
+
+    They are read from the [database] and [pragmas] sections of the config
+    file named by WORK_LOG_CONFIG (work_log.ini by default, it's optional),
+    then WORK_LOG_DB and WORK_LOG_PROFILE override the path and profile.
+    """
+    parser = configparser.ConfigParser()
+    parser.read(environ.get('WORK_LOG_CONFIG', DEFAULT_CONFIG_FILE))
+    path = parser.get('database', 'path', fallback=DEFAULT_PATH)
+    profile = parser.get('database', 'profile', fallback=DEFAULT_PROFILE)
+    pragmas = dict(parser.items('pragmas')) if parser.has_section(
+        'pragmas') else {}
+    path = environ.get('WORK_LOG_DB', path)
+    profile = environ.get('WORK_LOG_PROFILE', profile)
+    return path, profile, pragmas
+
+
+def configure(path=None, profile=None, **pragmas):
+    """Point db at path, connecting with the pragmas of profile
+
+    Arguments left out are taken from read_config(), keyword arguments
+    override single pragmas of the profile. Returns db.
+    """
+    path, settings = _connection_settings(path, profile, pragmas)
+    db.init(path, pragmas=settings)
+    return db
+
+
+def _connection_settings(path, profile, pragmas):
+    """Return the path and pragmas to connect with, see configure()"""
+    config_path, config_profile, config_pragmas = read_config()
+    profile = profile or config_profile
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError('Unknown profile {!r}, choose from {}'.format(
+            profile, ', '.join(sorted(PRAGMA_PROFILES))))
+    settings = dict(PRAGMA_PROFILES[profile])
+    settings.update(config_pragmas)
+    settings.update(pragmas)
+    return path or config_path, settings
+
+
+db = SqliteDatabase(None)
+configure()
+
+
+class QueryTimer:
+    """Wall and CPU time, rows returned and SQL issued of each call of the
+    functions of this module, see enable_query_timing()
+
+    Statements are collected with SQLite's trace callback on the
+    connections a call uses, with parameters filled in. Calls taking
+    slow_threshold seconds or more are kept in slow_queries, with the
+    EXPLAIN QUERY PLAN of each statement, and written to slow_log if
+    given. Calls made from within another call count towards it.
+    """
+    # Statements EXPLAIN QUERY PLAN can be run on
+    EXPLAINED = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+    def __init__(self, slow_threshold=0.1, slow_log=None, max_slow=100):
+        self.slow_threshold = slow_threshold
+        self.slow_log = slow_log
+        self.slow_queries = deque(maxlen=max_slow)
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def active(self):
+        """Return True if this thread is in a timed call"""
+        return getattr(self._local, 'statements', None) is not None
+
+    @contextlib.contextmanager
+    def tracing(self, database):
+        """Collect the statements run on database's connection in the block
+        into this thread's call, unless it already is
+        """
+        statements = getattr(self._local, 'statements', None)
+        connection = database.connection()
+        if statements is None or connection in self._local.connections:
+            yield
+            return
+
+        def trace(statement):
+            # Statements run by triggers and virtual tables come as
+            # comments, followed by their statement again
+            if statement.startswith('--') or (
+                    statements and statements[-1] == statement):
+                return
+            statements.append(statement)
+
+        self._local.connections[connection] = trace
+        connection.set_trace_callback(trace)
+        try:
+            yield
+        finally:
+            connection.set_trace_callback(None)
+            getattr(self._local, 'connections', {}).pop(connection, None)
+
+    def _start(self):
+        self._local.statements = []
+        self._local.connections = {}
+        return time.perf_counter(), time.thread_time()
+
+    def _stop(self, started):
+        """End this thread's call, returns its statements, wall and CPU"""
+        wall = time.perf_counter() - started[0]
+        cpu = time.thread_time() - started[1]
+        statements = self._local.statements
+        self._local.statements = None
+        return statements, wall, cpu
+
+    def time_call(self, name, function, args, kwargs):
+        """Return function(*args, **kwargs), recording the call as name"""
+        started = self._start()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            statements, wall, cpu = self._stop(started)
+        self.record(name, args, kwargs, statements, _rows_returned(result),
+                    wall, cpu)
+        return result
+
+    def time_iterator(self, name, iterator, args, kwargs):
+        """Yield the items of iterator, recording the time spent getting
+        them, not using them, as a call of name
+
+        The call is recorded however iterating ends, including when the
+        consumer stops early and closes it. Statements are only traced
+        while an item is fetched, so those the consumer runs between items
+        on the same connection aren't counted.
+        """
+        statements, connections = [], {}
+        wall, cpu, rows = 0.0, 0.0, 0
+        iterator = iter(iterator)
+        try:
+            while True:
+                started = self._start()
+                # The statements and traced connections carry on across
+                # items
+                self._local.statements = statements
+                self._local.connections = connections
+                for connection, trace in connections.items():
+                    connection.set_trace_callback(trace)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    for connection in connections:
+                        connection.set_trace_callback(None)
+                    _, item_wall, item_cpu = self._stop(started)
+                    wall += item_wall
+                    cpu += item_cpu
+                rows += 1
+                yield item
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+            self.record(name, args, kwargs, statements, rows, wall, cpu)
+
+    def record(self, name, args, kwargs, statements, rows, wall, cpu):
+        """Add a call to the counters, and to the slow queries if it took
+        slow_threshold seconds or more
+        """
+        slow = wall >= self.slow_threshold
+        with self._lock:
+            counters = self._counters.get(name)
+            if counters is None:
+                counters = self._counters[name] = {
+                    'calls': 0, 'rows': 0, 'statements': 0, 'wall': 0.0,
+                    'cpu': 0.0, 'max_wall': 0.0, 'slow': 0}
+            counters['calls'] += 1
+            counters['rows'] += rows
+            counters['statements'] += len(statements)
+            counters['wall'] += wall
+            counters['cpu'] += cpu
+            counters['max_wall'] = max(counters['max_wall'], wall)
+            counters['slow'] += slow
+        if slow:
+            self._log_slow({
+                'function': name,
+                'arguments': _call_repr(args, kwargs),
+                'rows': rows,
+                'wall': wall,
+                'cpu': cpu,
+                'statements': [(statement, self._query_plan(statement))
+                               for statement in statements],
+            })
+
+    def _query_plan(self, statement):
+        """Return the EXPLAIN QUERY PLAN lines of statement, or [] for
+        statements without a plan
+        """
+        if statement.lstrip().split(None, 1)[0].upper() not in self.EXPLAINED:
+            return []
+        try:
+            with _connection() as database:
+                rows = database.execute_sql(
+                    'EXPLAIN QUERY PLAN ' + statement).fetchall()
+        except DatabaseError as error:
+            return ['(no plan: {})'.format(error)]
+        # Rows are (id, parent id, unused, detail), children after parents
+        depths = {0: 0}
+        plan = []
+        for node, parent, _, detail in rows:
+            depths[node] = depths.get(parent, 0) + 1
+            plan.append('  ' * (depths[node] - 1) + detail)
+        return plan
+
+    def _log_slow(self, call):
+        with self._lock:
+            self.slow_queries.append(call)
+            if self.slow_log is None:
+                return
+            lines = ['slow work_log_db call {function}({arguments}): '
+                     '{wall:.3f}s wall, {cpu:.3f}s CPU, {rows:,} '
+                     'rows'.format(**call)]
+            for statement, plan in call['statements']:
+                lines.append('    ' + statement)
+                lines.extend('        ' + line for line in plan)
+            self.slow_log.write('\n'.join(lines) + '\n')
+            self.slow_log.flush()
+
+    def stats(self):
+        """Return the counters of each function called so far, by name"""
+        with self._lock:
+            return {name: dict(counters)
+                    for name, counters in self._counters.items()}
+
+
+def _rows_returned(result):
+    """Return how many entries, or other rows, a call returned"""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, Mapping):
+        return 1
+    return 0
+
+
+def _call_repr(args, kwargs):
+    """Return the arguments of a call as they'd be written, shortened"""
+    arguments = [reprlib.repr(argument) for argument in args]
+    arguments += ['{}={}'.format(name, reprlib.repr(value))
+                  for name, value in kwargs.items()]
+    return ', '.join(arguments)
+
+
+# The query timer, None until enable_query_timing is called
+_query_timer = None
+
+
+def enable_query_timing(slow_threshold=0.1, slow_log=None, max_slow=100):
+    """Start timing the calls of this module's functions, returns the
+    QueryTimer
+
+    Calls taking slow_threshold seconds or more are written with their
+    statements and query plans to slow_log, a text file object, if given,
+    and the last max_slow are kept for slow_queries().
+    """
+    global _query_timer
+    _query_timer = QueryTimer(slow_threshold, slow_log, max_slow)
+    return _query_timer
+
+
+def disable_query_timing():
+    """Stop timing calls and drop the counters"""
+    global _query_timer
+    _query_timer = None
+
+
+def query_timing_stats():
+    """Return a dict of the calls, rows returned, statements, total and
+    longest wall time, CPU time and slow calls of each function timed, by
+    name, None if query timing isn't enabled
+    """
+    if _query_timer is None:
+        return None
+    return _query_timer.stats()
+
+
+def slow_queries():
+    """Return the slow calls recorded, oldest first, each a dict of the
+    function, arguments, rows, wall and CPU seconds and its statements,
+    (SQL, query plan lines) pairs; None if query timing isn't enabled
+    """
+    if _query_timer is None:
+        return None
+    return list(_query_timer.slow_queries)
+
+
+def _timed(function):
+    """Record calls of function with the query timer when it's enabled
+
+    Disabled, this costs one global lookup per call. Generator functions
+    are timed while their items are fetched.
+    """
+    name = function.__qualname__
+    if inspect.isgeneratorfunction(function):
+        @functools.wraps(function)
+        def timed_generator(*args, **kwargs):
+            timer = _query_timer
+            if timer is None or timer.active():
+                return function(*args, **kwargs)
+            return timer.time_iterator(
+                name, function(*args, **kwargs), args, kwargs)
+        return timed_generator
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        timer = _query_timer
+        if timer is None or timer.active():
+            return function(*args, **kwargs)
+        return timer.time_call(name, function, args, kwargs)
+    return timed
+
+
+def normalize_employee_name(employee_name):
+    """Return employee_name case-folded with runs of whitespace collapsed
+    to single spaces, the form Employee.key holds
+    """
+    return ' '.join(employee_name.split()).casefold()
+
+
+def normalize_time_spent(time_spent):
+    """Return time_spent as a whole number of minutes, rounded as the
+    entry table stores it, ValueError if it isn't a number
+    """
+    return int(round(float(str(time_spent).strip())))
+
+
+class Employee(Model):
+    """An employee name, stored once and referred to by its id from each
+    of their entries
+    """
+    name = CharField(max_length=50, unique=True)
+    # normalize_employee_name(name), for case-insensitive prefix searches
+    key = CharField(max_length=50, collation='NOCASE', index=True)
+
+    class Meta:
+        database = db
 
 
 class Entry(Model):
-    employee_name = CharField(max_length=50)
-    date = DateField()
+    employee = ForeignKeyField(Employee, backref='entries', index=False)
+    # Only canonical YYYY-MM-DD text, which compares and sorts like the
+    # dates themselves, so equality and BETWEEN searches can use indexes
+    date = DateField(constraints=[Check('"date" IS date("date")')])
     task_name = CharField(max_length=50)
     time_spent = IntegerField(default=0)
     optional_notes = TextField()
 
     class Meta:
         database = db
+        # Every search orders by date, so date is the trailing column of
+        # each composite index to let SQLite skip the sort
+        indexes = (
+            (('date',), False),
+            (('time_spent', 'date'), False),
+            (('employee', 'date'), False),
+        )
+
+
+class SchemaVersion(Model):
+    version = IntegerField(primary_key=True)
+    applied_at = DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        database = db
+        table_name = 'schema_version'
+
+
+class DailyTotal(Model):
+    """Minutes and number of entries per employee per day, kept in step
+    with entry by the triggers in DAILY_TOTAL_TRIGGERS
+    """
+    employee_name = CharField(max_length=50)
+    date = DateField()
+    total_minutes = IntegerField(default=0)
+    entries = IntegerField(default=0)
+
+    class Meta:
+        database = db
+        table_name = 'daily_total'
+        primary_key = CompositeKey('employee_name', 'date')
+        indexes = (
+            (('date', 'employee_name'), False),
+        )
+
+
+# entry as the first version of work_log_db created it, the schema
+# every migration builds on
+ENTRY_TABLE_0 = """CREATE TABLE IF NOT EXISTS "entry" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "employee_name" VARCHAR(50) NOT NULL,
+    "date" DATE NOT NULL,
+    "task_name" VARCHAR(50) NOT NULL,
+    "time_spent" INTEGER NOT NULL,
+    "optional_notes" TEXT NOT NULL)"""
+
+# The search indexes of migration 1 as (name, columns), later columns
+# bring their own indexes in their own migrations
+SEARCH_INDEXES = [
+    ('entry_date', '"date"'),
+    ('entry_employee_name_date', '"employee_name", "date"'),
+    ('entry_time_spent_date', '"time_spent", "date"'),
+]
+
+
+def _create_search_indexes(database):
+    """Create the indexes of SEARCH_INDEXES that don't exist"""
+    for name, columns in SEARCH_INDEXES:
+        database.execute_sql('CREATE INDEX IF NOT EXISTS "{}" ON "entry" '
+                             '({})'.format(name, columns))
+
+
+def _migration_1(database):
+    """Add the search indexes to entry"""
+    _create_search_indexes(database)
+
+
+# entry_fts is an external content FTS5 table: it stores only the trigram
+# index and reads task_name and optional_notes back from entry by rowid.
+# The trigram tokenizer matches any substring of 3 or more characters
+# case-insensitively, which is what exact_search's LIKE '%x%' promises.
+FTS_TABLE = 'entry_fts'
+
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS entry_fts USING fts5(
+        task_name, optional_notes,
+        content='entry', content_rowid='id', tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS entry_fts_insert AFTER INSERT ON entry
+    BEGIN
+        INSERT INTO entry_fts(rowid, task_name, optional_notes)
+        VALUES (new.id, new.task_name, new.optional_notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS entry_fts_delete AFTER DELETE ON entry
+    BEGIN
+        INSERT INTO entry_fts(entry_fts, rowid, task_name, optional_notes)
+        VALUES ('delete', old.id, old.task_name, old.optional_notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS entry_fts_update
+    AFTER UPDATE OF task_name, optional_notes ON entry
+    BEGIN
+        INSERT INTO entry_fts(entry_fts, rowid, task_name, optional_notes)
+        VALUES ('delete', old.id, old.task_name, old.optional_notes);
+        INSERT INTO entry_fts(rowid, task_name, optional_notes)
+        VALUES (new.id, new.task_name, new.optional_notes);
+    END""",
+]
+
+# The trigram tokenizer can't match anything shorter than this
+FTS_MIN_LENGTH = 3
+
+
+def _create_full_text_index(database):
+    """Create entry_fts and its sync triggers, returns False if the
+    SQLite library lacks FTS5 or the trigram tokenizer
+    """
+    try:
+        for statement in FTS_SCHEMA:
+            database.execute_sql(statement)
+    except OperationalError:
+        return False
+    database.execute_sql(
+        "INSERT INTO entry_fts(entry_fts) VALUES ('rebuild')")
+    return True
+
+
+def _migration_2(database):
+    """Add the entry_fts full-text index when SQLite supports it"""
+    _create_full_text_index(database)
+
+
+DAILY_TOTAL_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS daily_total_insert AFTER INSERT ON entry
+    BEGIN
+        INSERT INTO daily_total (employee_name, date, total_minutes, entries)
+        VALUES (new.employee_name, new.date, new.time_spent, 1)
+        ON CONFLICT (employee_name, date) DO UPDATE SET
+            total_minutes = total_minutes + excluded.total_minutes,
+            entries = entries + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS daily_total_delete AFTER DELETE ON entry
+    BEGIN
+        UPDATE daily_total SET
+            total_minutes = total_minutes - old.time_spent,
+            entries = entries - 1
+        WHERE employee_name = old.employee_name AND date = old.date;
+        DELETE FROM daily_total
+        WHERE employee_name = old.employee_name AND date = old.date
+            AND entries = 0;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS daily_total_update
+    AFTER UPDATE OF employee_name, date, time_spent ON entry
+    BEGIN
+        UPDATE daily_total SET
+            total_minutes = total_minutes - old.time_spent,
+            entries = entries - 1
+        WHERE employee_name = old.employee_name AND date = old.date;
+        DELETE FROM daily_total
+        WHERE employee_name = old.employee_name AND date = old.date
+            AND entries = 0;
+        INSERT INTO daily_total (employee_name, date, total_minutes, entries)
+        VALUES (new.employee_name, new.date, new.time_spent, 1)
+        ON CONFLICT (employee_name, date) DO UPDATE SET
+            total_minutes = total_minutes + excluded.total_minutes,
+            entries = entries + 1;
+    END""",
+]
+
+
+# Fills daily_total from entry as it was when migration 3 ran, with the
+# employee names in entry itself
+DAILY_TOTAL_FROM_ENTRY_3 = """INSERT INTO daily_total
+    (employee_name, date, total_minutes, entries)
+    SELECT employee_name, date, SUM(time_spent), COUNT(*)
+    FROM entry GROUP BY employee_name, date"""
+
+# Fills daily_total from entry and employee
+DAILY_TOTAL_FROM_ENTRY = """INSERT INTO daily_total
+    (employee_name, date, total_minutes, entries)
+    SELECT employee.name, entry.date, SUM(entry.time_spent), COUNT(*)
+    FROM entry JOIN employee ON employee.id = entry.employee_id
+    GROUP BY employee.name, entry.date"""
+
+
+@_timed
+def rebuild_daily_totals():
+    """Recompute daily_total from entry, returns the number of rows"""
+    with _connection(writing=True) as database:
+        with database.atomic():
+            database.execute_sql('DELETE FROM daily_total')
+            database.execute_sql(DAILY_TOTAL_FROM_ENTRY)
+        _invalidate_cache()
+        return database.execute_sql(
+            'SELECT COUNT(*) FROM daily_total').fetchone()[0]
+
+
+def _migration_3(database):
+    """Add the daily_total summary table and the triggers maintaining it"""
+    DailyTotal.create_table(safe=True)
+    for statement in DAILY_TOTAL_TRIGGERS:
+        database.execute_sql(statement)
+    database.execute_sql(DAILY_TOTAL_FROM_ENTRY_3)
+
+
+# entry as created by migration 4, SQLite can only add the CHECK on date
+# by copying the rows to a new table
+ENTRY_TABLE_4 = """CREATE TABLE "entry_new" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "employee_name" VARCHAR(50) NOT NULL,
+    "date" DATE NOT NULL CHECK ("date" IS date("date")),
+    "task_name" VARCHAR(50) NOT NULL,
+    "time_spent" INTEGER NOT NULL,
+    "optional_notes" TEXT NOT NULL)"""
+
+# A date stored as YYYY/MM/DD or with a time of day, as YYYY-MM-DD
+CANONICAL_DATE = """date(replace("date", '/', '-'))"""
+
+
+def _migration_4(database):
+    """Store every date as YYYY-MM-DD and add a CHECK keeping them so
+
+    The rows keep their ids, so entry_fts stays valid, while the indexes
+    and triggers dropped along with the old table are created again.
+    """
+    invalid = [row[0] for row in database.execute_sql(
+        'SELECT id FROM entry WHERE {} IS NULL LIMIT 10'.format(
+            CANONICAL_DATE))]
+    if invalid:
+        raise ValueError(
+            "The dates of entries {} aren't valid dates, correct them and "
+            "run again".format(', '.join(map(str, invalid))))
+    # Through the triggers, so daily_total moves the rows too
+    database.execute_sql('UPDATE entry SET "date" = {0} '
+                         'WHERE "date" IS NOT {0}'.format(CANONICAL_DATE))
+
+    database.execute_sql(ENTRY_TABLE_4)
+    database.execute_sql(
+        'INSERT INTO entry_new (id, employee_name, "date", task_name, '
+        'time_spent, optional_notes) SELECT id, employee_name, "date", '
+        'task_name, time_spent, optional_notes FROM entry')
+    database.execute_sql('DROP TABLE entry')
+    database.execute_sql('ALTER TABLE entry_new RENAME TO entry')
+    _create_search_indexes(database)
+    if database.table_exists(FTS_TABLE):
+        for statement in FTS_SCHEMA[1:]:
+            database.execute_sql(statement)
+    if database.table_exists(DailyTotal._meta.table_name):
+        for statement in DAILY_TOTAL_TRIGGERS:
+            database.execute_sql(statement)
+
+
+def _migration_5(database):
+    """Store every time_spent as an integer
+
+    INTEGER affinity already converts whole numbers given as text, this
+    rounds the rest, such as 59.6 which was kept as a REAL and so never
+    matched a search for a whole number of minutes.
+    """
+    rows = database.execute_sql(
+        "SELECT id, time_spent FROM entry "
+        "WHERE typeof(time_spent) != 'integer'").fetchall()
+    minutes = {}
+    for entry_id, time_spent in rows:
+        try:
+            minutes[entry_id] = normalize_time_spent(time_spent)
+        except ValueError:
+            pass
+    invalid = [entry_id for entry_id, _ in rows if entry_id not in minutes]
+    if invalid:
+        raise ValueError(
+            "The time spent of entries {} isn't a number, correct them and "
+            "run again".format(', '.join(map(str, invalid[:10]))))
+    for entry_id, time_spent in minutes.items():
+        database.execute_sql(
+            'UPDATE entry SET time_spent = ? WHERE id = ?',
+            [time_spent, entry_id])
+
+
+def _migration_6(database):
+    """Add employee_key and its index for employee name prefix searches"""
+    columns = [column.name for column in database.get_columns('entry')]
+    if 'employee_key' not in columns:
+        database.execute_sql('ALTER TABLE entry ADD COLUMN employee_key '
+                             'VARCHAR(50) COLLATE NOCASE')
+    names = [row[0] for row in database.execute_sql(
+        'SELECT DISTINCT employee_name FROM entry '
+        'WHERE employee_key IS NULL')]
+    for name in names:
+        database.execute_sql(
+            'UPDATE entry SET employee_key = ? WHERE employee_name = ?',
+            [normalize_employee_name(name), name])
+    database.execute_sql(
+        'CREATE INDEX IF NOT EXISTS "entry_employee_key_date" '
+        'ON "entry" ("employee_key", "date")')
+
+
+# employee as created by migration 7, Employee
+EMPLOYEE_SCHEMA_7 = [
+    """CREATE TABLE IF NOT EXISTS "employee" (
+        "id" INTEGER NOT NULL PRIMARY KEY,
+        "name" VARCHAR(50) NOT NULL,
+        "key" VARCHAR(50) NOT NULL COLLATE NOCASE)""",
+    'CREATE UNIQUE INDEX IF NOT EXISTS "employee_name" '
+    'ON "employee" ("name")',
+    'CREATE INDEX IF NOT EXISTS "employee_key" ON "employee" ("key")',
+]
+
+# entry as created by migration 7, the name replaced by an employee id
+ENTRY_TABLE_7 = """CREATE TABLE "entry_new" (
+    "id" INTEGER NOT NULL PRIMARY KEY,
+    "employee_id" INTEGER NOT NULL REFERENCES "employee" ("id"),
+    "date" DATE NOT NULL CHECK ("date" IS date("date")),
+    "task_name" VARCHAR(50) NOT NULL,
+    "time_spent" INTEGER NOT NULL,
+    "optional_notes" TEXT NOT NULL)"""
+
+ENTRY_INDEXES_7 = [
+    ('entry_date', '"date"'),
+    ('entry_time_spent_date', '"time_spent", "date"'),
+    ('entry_employee_id_date', '"employee_id", "date"'),
+]
+
+# The daily_total triggers once entry refers to employees by id
+DAILY_TOTAL_TRIGGERS_7 = [
+    """CREATE TRIGGER IF NOT EXISTS daily_total_insert AFTER INSERT ON entry
+    BEGIN
+        INSERT INTO daily_total (employee_name, date, total_minutes, entries)
+        SELECT name, new.date, new.time_spent, 1
+        FROM employee WHERE id = new.employee_id
+        ON CONFLICT (employee_name, date) DO UPDATE SET
+            total_minutes = total_minutes + excluded.total_minutes,
+            entries = entries + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS daily_total_delete AFTER DELETE ON entry
+    BEGIN
+        UPDATE daily_total SET
+            total_minutes = total_minutes - old.time_spent,
+            entries = entries - 1
+        WHERE employee_name = (
+            SELECT name FROM employee WHERE id = old.employee_id)
+            AND date = old.date;
+        DELETE FROM daily_total
+        WHERE employee_name = (
+            SELECT name FROM employee WHERE id = old.employee_id)
+            AND date = old.date AND entries = 0;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS daily_total_update
+    AFTER UPDATE OF employee_id, date, time_spent ON entry
+    BEGIN
+        UPDATE daily_total SET
+            total_minutes = total_minutes - old.time_spent,
+            entries = entries - 1
+        WHERE employee_name = (
+            SELECT name FROM employee WHERE id = old.employee_id)
+            AND date = old.date;
+        DELETE FROM daily_total
+        WHERE employee_name = (
+            SELECT name FROM employee WHERE id = old.employee_id)
+            AND date = old.date AND entries = 0;
+        INSERT INTO daily_total (employee_name, date, total_minutes, entries)
+        SELECT name, new.date, new.time_spent, 1
+        FROM employee WHERE id = new.employee_id
+        ON CONFLICT (employee_name, date) DO UPDATE SET
+            total_minutes = total_minutes + excluded.total_minutes,
+            entries = entries + 1;
+    END""",
+]
+
+
+def _migration_7(database):
+    """Move the employee names into the employee table, entry keeps only
+    the id of each entry's employee
+
+    Like migration 4 the rows keep their ids and the indexes and triggers
+    are created again on the new table. employee_key goes with the old
+    table, employee.key replaces it.
+    """
+    for statement in EMPLOYEE_SCHEMA_7:
+        database.execute_sql(statement)
+    names = [row[0] for row in database.execute_sql(
+        'SELECT employee_name FROM entry GROUP BY employee_name '
+        'ORDER BY MIN(id)')]
+    for name in names:
+        database.execute_sql(
+            'INSERT OR IGNORE INTO employee (name, "key") VALUES (?, ?)',
+            [name, normalize_employee_name(name)])
+
+    database.execute_sql(ENTRY_TABLE_7)
+    database.execute_sql(
+        'INSERT INTO entry_new (id, employee_id, "date", task_name, '
+        'time_spent, optional_notes) SELECT entry.id, employee.id, '
+        'entry."date", entry.task_name, entry.time_spent, '
+        'entry.optional_notes FROM entry '
+        'JOIN employee ON employee.name = entry.employee_name')
+    database.execute_sql('DROP TABLE entry')
+    database.execute_sql('ALTER TABLE entry_new RENAME TO entry')
+    for name, columns in ENTRY_INDEXES_7:
+        database.execute_sql('CREATE INDEX IF NOT EXISTS "{}" ON "entry" '
+                             '({})'.format(name, columns))
+    if database.table_exists(FTS_TABLE):
+        for statement in FTS_SCHEMA[1:]:
+            database.execute_sql(statement)
+    if database.table_exists(DailyTotal._meta.table_name):
+        for statement in DAILY_TOTAL_TRIGGERS_7:
+            database.execute_sql(statement)
+
+
+# Append new migrations to the end, never renumber or edit old ones
+MIGRATIONS = [
+    (1, _migration_1),
+    (2, _migration_2),
+    (3, _migration_3),
+    (4, _migration_4),
+    (5, _migration_5),
+    (6, _migration_6),
+    (7, _migration_7),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version():
+    """Return the schema version of the database Entry is bound to"""
+    database = Entry._meta.database
+    with database.bind_ctx([SchemaVersion]):
+        if not SchemaVersion.table_exists():
+            return 0
+        return SchemaVersion.select(
+            fn.MAX(SchemaVersion.version)).scalar() or 0
+
+
+def migrate():
+    """Apply every migration newer than the database's schema version
+
+    Each migration runs in its own transaction together with the row that
+    records it, so an interrupted run can simply be repeated.
+    Returns the list of versions that were applied.
+    """
+    database = Entry._meta.database
+    applied = []
+    with database.bind_ctx([SchemaVersion, DailyTotal]):
+        database.create_tables([SchemaVersion], safe=True)
+        current = schema_version()
+        for version, migration in MIGRATIONS:
+            if version <= current:
+                continue
+            with database.atomic():
+                migration(database)
+                SchemaVersion.create(version=version)
+            applied.append(version)
+    # Stamp the file header so later runs can skip the schema check
+    if database.pragma('user_version') != LATEST_VERSION:
+        database.pragma('user_version', LATEST_VERSION)
+    if applied:
+        _full_text_indexes.clear()
+        _invalidate_cache()
+    return applied
+
+
+def schema_is_current():
+    """Return True if the database was stamped by migrate() with the
+    latest schema version
+
+    The stamp is PRAGMA user_version, read from the already loaded file
+    header, so this is much cheaper than looking up every table.
+    """
+    return Entry._meta.database.pragma('user_version') == LATEST_VERSION
 
 
 def initialize():
-    """Create the database and table if they don't exist"""
-    db.connect()
-    db.create_tables([Entry], safe=True)
+    """Create the database and table if they don't exist
+
+    Databases stamped with the latest schema version are only connected,
+    the tables and migrations were checked by an earlier run. A new
+    database starts out as ENTRY_TABLE_0 and is brought up to date by
+    the migrations like any other.
+    """
+    database = Entry._meta.database
+    database.connect(reuse_if_open=True)
+    if schema_is_current():
+        return
+    database.execute_sql(ENTRY_TABLE_0)
+    migrate()
+
+
+class IdleTimeoutPool(PooledSqliteDatabase):
+    """A PooledSqliteDatabase closing connections that have sat unused in
+    the pool for more than idle_timeout seconds
+
+    peewee's stale_timeout is a connection's age instead, which closes
+    busy connections and leaves idle ones open. Idle connections are
+    closed whenever a connection is checked out or handed back.
+    """
+    def __init__(self, database, idle_timeout=300, **kwargs):
+        self.idle_timeout = idle_timeout
+        super().__init__(database, **kwargs)
+
+    def _close_idle(self):
+        # The pool is a heap of (time handed back, connection), oldest
+        # first, callers hold the database's lock
+        expired = time.time() - self.idle_timeout
+        while self._connections and self._connections[0][0] < expired:
+            _, connection = heapq.heappop(self._connections)
+            self._close(connection, close_conn=True)
+
+    def _connect(self):
+        self._close_idle()
+        return super()._connect()
+
+    def _close(self, conn, close_conn=False):
+        key = self.conn_key(conn)
+        if not close_conn and key in self._in_use:
+            # The pool keeps the timestamp as the connection goes back,
+            # make it the time it went idle rather than was opened
+            self._in_use[key] = self._in_use[key]._replace(
+                timestamp=time.time())
+        super()._close(conn, close_conn)
+        if not close_conn:
+            self._close_idle()
+
+
+class ConnectionPools:
+    """A pool of reader connections and a pool of one writer connection
+    to the same database file
+
+    peewee hands each thread its own connection from a pool, the writer
+    is shared in turn under write_lock since SQLite only allows one
+    writer at a time anyway.
+    """
+    def __init__(self, path, pragmas, max_connections=8, idle_timeout=300,
+                 timeout=10):
+        # Connections move between threads as they are checked out
+        self.read = IdleTimeoutPool(
+            path, idle_timeout, pragmas=pragmas,
+            max_connections=max_connections, timeout=timeout,
+            check_same_thread=False)
+        self.write = IdleTimeoutPool(
+            path, idle_timeout, pragmas=pragmas, max_connections=1,
+            check_same_thread=False)
+        self.write_lock = threading.Lock()
+
+    def close(self):
+        """Close every connection of both pools"""
+        self.read.close_all()
+        self.write.close_all()
+
+
+# The connection pools, None until configure_pool is called
+_pools = None
+
+
+def configure_pool(path=None, profile='fast', max_connections=8,
+                   idle_timeout=300, timeout=10, **pragmas):
+    """Run the functions of this module on connection pools so they can
+    be called from many threads at once
+
+    Searches check a connection out of a pool of up to max_connections
+    readers, waiting up to timeout seconds for one to be free, and writes
+    take turns on a single writer connection. With WAL, which the fast
+    profile uses, readers never wait for the writer. Connections left
+    unused for more than idle_timeout seconds are closed. path, profile
+    and pragmas are those of configure(), the schema is brought up to
+    date through the writer. Returns the ConnectionPools.
+    """
+    global _pools
+    path, settings = _connection_settings(path, profile, pragmas)
+    pools = ConnectionPools(
+        path, settings, max_connections, idle_timeout, timeout)
+    with pools.write.bind_ctx([Entry]):
+        initialize()
+    pools.write.close()
+    disable_pool()
+    _pools = pools
+    _invalidate_cache()
+    return pools
+
+
+def disable_pool():
+    """Close the connection pools and go back to the database Entry is
+    bound to
+    """
+    global _pools
+    if _pools is not None:
+        _pools.close()
+        _pools = None
+        _invalidate_cache()
+
+
+@contextlib.contextmanager
+def _connection(writing=False):
+    """Yield the database to run a query on and hold a connection to it
+
+    Without pools that is the database Entry is bound to. With pools a
+    reader, or the writer if writing, is checked out for the block and
+    handed back after it, unless the thread already holds one.
+    """
+    pools = _pools
+    if pools is None:
+        database = Entry._meta.database
+    else:
+        database = pools.write if writing else pools.read
+    if pools is None or not database.is_closed():
+        with _tracing(database):
+            yield database
+        return
+    with pools.write_lock if writing else contextlib.nullcontext():
+        database.connect()
+        try:
+            with _tracing(database):
+                yield database
+        finally:
+            database.close()
+
+
+def _forget_closed_connections(by_connection):
+    """Drop the closed connections from a dict of (connection, value) by
+    the id() of the connection
+    """
+    for key, (connection, _) in list(by_connection.items()):
+        try:
+            connection.total_changes
+        except sqlite3.ProgrammingError:
+            by_connection.pop(key, None)
+
+
+@contextlib.contextmanager
+def _write_transaction():
+    """Yield the database to write on in a transaction that takes the
+    write lock as it begins
+
+    A deferred transaction that reads before writing can't wait for
+    another writer to finish, SQLite fails its first write with database
+    is locked straight away rather than retrying for busy_timeout.
+    """
+    with _connection(writing=True) as database:
+        with database.atomic('IMMEDIATE'):
+            yield database
+
 
+def _tracing(database):
+    """Return a context collecting the statements run on database for the
+    query timer, if it's enabled
+    """
+    timer = _query_timer
+    if timer is None:
+        return contextlib.nullcontext()
+    return timer.tracing(database)
 
+
+class SearchCache:
+    """Least recently used search results, bounded by count and bytes
+
+    Results are dropped whenever the entry table may have changed: on
+    writes through this module, which call clear(), and on commits from
+    other connections, which bump SQLite's PRAGMA data_version.
+    """
+    def __init__(self, max_entries=128, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._data_versions = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _size(results):
+        """Estimate the bytes held by a list of search result rows"""
+        size = sys.getsizeof(results)
+        for row in results:
+            values = row.values() if isinstance(row, Mapping) else row
+            size += sys.getsizeof(row) + sum(
+                sys.getsizeof(value) for value in values)
+        return size
+
+    @staticmethod
+    def _data_version():
+        """Return the connection searches run on and its data_version"""
+        with _connection() as database:
+            connection = database.connection()
+            return connection, connection.execute(
+                'PRAGMA data_version').fetchone()[0]
+
+    def _check_data_version(self, data_version):
+        """Clear the cache if another connection committed a change
+
+        Each connection counts the commits of the others from 1, so a
+        connection that hasn't been seen before clears it too. Connections
+        can't be weakly referenced and a new one may get the id() of a
+        closed one, so they are kept by id() along with the connection
+        itself, and closed ones are forgotten as new ones turn up.
+        """
+        connection, version = data_version
+        seen = self._data_versions.get(id(connection))
+        if seen is not None and seen[0] is connection and seen[1] == version:
+            return
+        self._clear()
+        if seen is None or seen[0] is not connection:
+            self._forget_closed_connections()
+        self._data_versions[id(connection)] = (connection, version)
+
+    def _forget_closed_connections(self):
+        _forget_closed_connections(self._data_versions)
+
+    def _clear(self):
+        if self._results:
+            self.invalidations += 1
+        self._results.clear()
+        self.bytes = 0
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._clear()
+
+    def get(self, key):
+        """Return the results cached for key or None"""
+        data_version = self._data_version()
+        with self._lock:
+            self._check_data_version(data_version)
+            results = self._results.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.hits += 1
+            return results[0]
+
+    def put(self, key, results):
+        """Cache results for key, evicting the least recently used"""
+        size = self._size(results)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._results:
+                self.bytes -= self._results.pop(key)[1]
+            self._results[key] = (results, size)
+            self.bytes += size
+            while (len(self._results) > self.max_entries or
+                   self.bytes > self.max_bytes):
+                self.bytes -= self._results.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def stats(self):
+        """Return the hit, miss and size counters as a dict"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._results),
+                'bytes': self.bytes,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+# The search result cache, None until enable_cache is called
+_cache = None
+
+
+def enable_cache(max_entries=128, max_bytes=32 * 1024 * 1024):
+    """Start caching search results, returns the SearchCache"""
+    global _cache
+    _cache = SearchCache(max_entries, max_bytes)
+    return _cache
+
+
+def disable_cache():
+    """Stop caching search results and drop those cached"""
+    global _cache
+    _cache = None
+
+
+def cache_stats():
+    """Return the search cache's counters, None if it isn't enabled"""
+    if _cache is None:
+        return None
+    return _cache.stats()
+
+
+def _invalidate_cache():
+    """Drop cached search results after a write"""
+    if _cache is not None:
+        _cache.clear()
+
+
+def _through_cache(key, load):
+    """Return the rows load() returns, from the search cache when it's
+    enabled
+
+    Each call gets its own copies of cached SearchRows since the UI edits
+    results in place.
+    """
+    cache = _cache
+    if cache is None:
+        return load()
+    results = cache.get(key)
+    if results is None:
+        results = load()
+        cache.put(key, results)
+    return [row.copy() if isinstance(row, SearchRow) else row
+            for row in results]
+
+
+def _cached(search):
+    """Serve search from the search cache when it's enabled
+
+    Lazy results aren't cached here, SearchResults caches its count and
+    pages instead. Arguments are bound to search's parameters, so lazy is
+    seen however it's passed and calls that differ only in spelling out
+    defaults share results.
+    """
+    signature = inspect.signature(search)
+    keyword_parameters = [name for name, parameter
+                          in signature.parameters.items()
+                          if parameter.kind == parameter.VAR_KEYWORD]
+
+    @functools.wraps(search)
+    def cached_search(*args, **kwargs):
+        if _cache is None:
+            return search(*args, **kwargs)
+        arguments = signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        if arguments.arguments.get('lazy'):
+            return search(*args, **kwargs)
+        for name in keyword_parameters:
+            arguments.arguments[name] = tuple(
+                sorted(arguments.arguments[name].items()))
+        key = (search.__name__, tuple(arguments.arguments.items()))
+        return _through_cache(key, lambda: search(*args, **kwargs))
+    return cached_search
+
+
+def _employee_ids(database, employee_names):
+    """Return a dict of the Employee id of each of employee_names, adding
+    the employees that aren't in database yet
+
+    Call it in a _write_transaction(), which holds the write lock before
+    these reads.
+    """
+    employee_names = set(employee_names)
+    ids = {}
+    # Looked up in chunks under SQLite's 999 parameter limit
+    for names in chunked(employee_names, 900):
+        ids.update(Employee.select(Employee.name, Employee.id).where(
+            Employee.name.in_(names)).tuples().bind(database))
+    for name in employee_names - ids.keys():
+        ids[name] = Employee.insert(
+            name=name, key=normalize_employee_name(name)
+        ).bind(database).execute()
+    return ids
+
+
+def _entry_fields(log_entry, employee_ids):
+    """Return the Entry column values for a log entry dict, time_spent
+    as an int and the employee by its id in employee_ids
+    """
+    return {
+        'employee': employee_ids[log_entry['employee_name']],
+        'date': log_entry['date'],
+        'task_name': log_entry['task_name'],
+        'time_spent': normalize_time_spent(log_entry['time_spent']),
+        'optional_notes': log_entry['optional_notes']
+    }
+
+
+@_timed
 def add_entry(log_entry):
-    """Add entry to database"""
+    """Add entry to database, returns it with the id it was given
+
+    With group commit enabled the entry is added together with those of
+    other threads, this returns once their transaction has committed.
+    """
     if log_entry:
-        Entry.create(
-            employee_name=log_entry['employee_name'],
-            date=log_entry['date'],
-            task_name=log_entry['task_name'],
-            time_spent=log_entry['time_spent'],
-            optional_notes=log_entry['optional_notes']
-        )
-        return log_entry
+        writer = _group_commit
+        if writer is not None:
+            return writer.submit(log_entry).result()
+        with _write_transaction() as database:
+            fields = _entry_fields(log_entry, _employee_ids(
+                database, [log_entry['employee_name']]))
+            entry_id = Entry.insert(**fields).bind(database).execute()
+        _invalidate_cache()
+        return dict(log_entry, time_spent=fields['time_spent'], id=entry_id)
 
 
-def delete_entry(entry):
-    """Delete entry from database"""
+def _checked_entry(log_entry):
+    """Return a copy of a log entry dict with time_spent as an int and
+    date as a datetime.date, KeyError for a missing field and ValueError
+    for a value the entry table would reject
+    """
+    date = log_entry['date']
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    elif not isinstance(date, datetime.date):
+        try:
+            date = datetime.date.fromisoformat(str(date))
+        except ValueError:
+            raise ValueError(
+                '{!r} is not a YYYY-MM-DD date'.format(log_entry['date']))
+    for field in ('employee_name', 'task_name', 'optional_notes'):
+        if field not in log_entry:
+            raise KeyError(field)
+    return dict(log_entry, date=date,
+                time_spent=normalize_time_spent(log_entry['time_spent']))
 
-    employee_name = entry['employee_name']
-    date = entry['date']
-    task_name = entry['task_name']
-    time_spent = entry['time_spent']
-    optional_notes = entry['optional_notes']
 
-    entries = Entry.select().where(
-        Entry.employee_name == employee_name and
-        Entry.date == date and
-        Entry.task_name == task_name and
-        Entry.time_spent == time_spent and
-        Entry.optional_notes == optional_notes
-    )
+# Rows per INSERT statement in add_entries, keeps the 5 parameters per
+# row under the 999 parameter limit of older SQLite builds
+INSERT_ROWS = 999 // 5
 
-    for entry in entries:
-        entry.delete_instance()
 
+@_timed
+def add_entries(log_entries, batch_size=1000):
+    """Add many entries to database, committing once per batch_size entries
+
+    log_entries may be any iterable, it is consumed one batch at a time.
+    Returns the number of entries added.
+    """
+    added = 0
+    for batch in chunked(log_entries, batch_size):
+        with _write_transaction() as database:
+            employee_ids = _employee_ids(
+                database, [log_entry['employee_name'] for log_entry in batch])
+            for rows in chunked(batch, INSERT_ROWS):
+                Entry.insert_many(
+                    [_entry_fields(log_entry, employee_ids)
+                     for log_entry in rows]
+                ).bind(database).execute()
+        added += len(batch)
+        _invalidate_cache()
+    return added
+
+
+class GroupCommitWriter:
+    """Adds the entries submitted from any thread on a background thread,
+    committing up to max_batch of them per transaction
+
+    A transaction is committed once max_batch entries are waiting or
+    max_delay seconds after its first entry arrived, whichever is first,
+    so with many writers the cost of each commit (and its fsync) is shared
+    by the whole batch, while a lone writer waits at most max_delay.
+    """
+    # How many of the latest batch sizes and latencies stats() looks at
+    SAMPLES = 10000
+
+    def __init__(self, max_batch=500, max_delay=0.001):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=self.SAMPLES)
+        self._latencies = deque(maxlen=self.SAMPLES)
+        self.batches = 0
+        self.entries = 0
+        self.errors = 0
+        self.closed = False
+        self._thread = threading.Thread(
+            target=self._run, name='work_log_group_commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, log_entry):
+        """Queue log_entry, returns a Future of the added entry with its
+        id, resolved once the transaction holding it has committed
+        """
+        future = Future()
+        try:
+            log_entry = _checked_entry(log_entry)
+        except (KeyError, TypeError, ValueError) as error:
+            # Rejected before it could fail the batch it would join
+            with self._lock:
+                self.errors += 1
+            future.set_exception(error)
+            return future
+        with self._lock:
+            # Queued after close() nothing would ever commit it
+            if self.closed:
+                future.set_exception(
+                    RuntimeError('The group commit writer is closed'))
+                return future
+            self._queue.put((log_entry, future, time.perf_counter()))
+        return future
+
+    def close(self):
+        """Commit the entries already submitted and stop the thread, later
+        submits fail with RuntimeError
+        """
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _next_batch(self):
+        """Wait for an entry then gather more for up to max_delay seconds,
+        returns the batch and whether close() was called
+        """
+        item = self._queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(
+                    timeout=max(0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    @staticmethod
+    def _insert(batch):
+        """Add the entries of batch in one transaction, returns their ids"""
+        with _write_transaction() as database:
+            employee_ids = _employee_ids(database, [
+                log_entry['employee_name'] for log_entry, _, _ in batch])
+            return [Entry.insert(
+                **_entry_fields(log_entry, employee_ids)
+            ).bind(database).execute() for log_entry, _, _ in batch]
+
+    @_timed
+    def _commit(self, batch):
+        """Add the entries of batch in one transaction and resolve their
+        futures
+
+        If the transaction fails each entry is retried in a transaction
+        of its own, so only the futures of the entries at fault fail.
+        """
+        try:
+            results = self._insert(batch)
+        except Exception:
+            results = []
+            for item in batch:
+                try:
+                    results.extend(self._insert([item]))
+                except Exception as error:
+                    results.append(error)
+        _invalidate_cache()
+        committed = time.perf_counter()
+        failed = sum(isinstance(result, Exception) for result in results)
+        with self._lock:
+            self.batches += 1
+            self.entries += len(batch) - failed
+            self.errors += failed
+            self._batch_sizes.append(len(batch))
+            self._latencies.extend(
+                committed - submitted for _, _, submitted in batch)
+        for (log_entry, future, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(dict(log_entry, id=result))
+
+    def _run(self):
+        closed = False
+        while not closed:
+            batch, closed = self._next_batch()
+            if batch:
+                self._commit(batch)
+
+    def stats(self):
+        """Return the batch size and latency (seconds from submit to
+        commit) counters as a dict
+        """
+        with self._lock:
+            sizes = list(self._batch_sizes)
+            latencies = sorted(self._latencies)
+
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1,
+                                 int(fraction * len(latencies)))]
+
+        return {
+            'batches': self.batches,
+            'entries': self.entries,
+            'errors': self.errors,
+            'queued': self._queue.qsize(),
+            'mean_batch_size': sum(sizes) / len(sizes) if sizes else 0.0,
+            'max_batch_size': max(sizes, default=0),
+            'p50_latency': percentile(0.5),
+            'p99_latency': percentile(0.99),
+        }
+
+
+# The group commit writer add_entry uses, None until enable_group_commit
+_group_commit = None
+
+
+def enable_group_commit(max_batch=500, max_delay=0.001):
+    """Make add_entry commit entries in batches on a background thread,
+    returns the GroupCommitWriter
+
+    Entries are as durable as the profile's synchronous setting makes any
+    commit once add_entry returns, see GroupCommitWriter.
+    """
+    global _group_commit
+    disable_group_commit()
+    _group_commit = GroupCommitWriter(max_batch, max_delay)
+    return _group_commit
+
+
+def disable_group_commit():
+    """Commit the entries waiting for the background writer and stop it"""
+    global _group_commit
+    writer, _group_commit = _group_commit, None
+    if writer is not None:
+        writer.close()
+
+
+def group_commit_stats():
+    """Return the group commit writer's counters, None if it isn't enabled"""
+    if _group_commit is None:
+        return None
+    return _group_commit.stats()
+
+
+@_timed
+def get_entry(entry_id):
+    """Return the entry with entry_id as a SearchRow, or None"""
+    entries = _search_rows(search_query().where(Entry.id == entry_id))
+    return entries[0] if entries else None
+
+
+@_timed
+def delete_entry(entry):
+    """Delete entry, found by the id from its search result, from database"""
+    with _connection(writing=True) as database:
+        Entry.delete().where(
+            Entry.id == entry['id']).bind(database).execute()
+    _invalidate_cache()
     return entry
 
 
+@_timed
 def edit_entry(old_entry, new_entry):
-    """Edit entry in database"""
-    employee_name = old_entry['employee_name']
-    date = old_entry['date']
-    task_name = old_entry['task_name']
-    time_spent = old_entry['time_spent']
-    optional_notes = old_entry['optional_notes']
-
-    new_employee_name = new_entry['employee_name']
-    new_date = new_entry['date']
-    new_task_name = new_entry['task_name']
-    new_time_spent = new_entry['time_spent']
-    new_optional_notes = new_entry['optional_notes']
-
-    entries = Entry.select().where(
-        Entry.employee_name == employee_name and
-        Entry.date == date and
-        Entry.task_name == task_name and
-        Entry.time_spent == time_spent and
-        Entry.optional_notes == optional_notes
-    )
-
-    for entry in entries:
-        entry.employee_name = new_employee_name
-        entry.date = new_date
-        entry.task_name = new_task_name
-        entry.time_spent = new_time_spent
-        entry.optional_notes = new_optional_notes
-        entry.save()
-
-    return new_entry
-
-
-def exact_date_search(date):
+    """Edit entry, found by the id from its search result, in database"""
+    with _write_transaction() as database:
+        fields = _entry_fields(new_entry, _employee_ids(
+            database, [new_entry['employee_name']]))
+        Entry.update(**fields).where(
+            Entry.id == old_entry['id']).bind(database).execute()
+    _invalidate_cache()
+    return dict(new_entry, time_spent=fields['time_spent'])
+
+
+# Column order of the tuples iter_entries yields and of SearchRow
+ENTRY_COLUMNS = (
+    'id', 'employee_name', 'date', 'task_name', 'time_spent',
+    'optional_notes',
+)
+
+# The column each of ENTRY_COLUMNS is read from
+_ENTRY_COLUMN_FIELDS = [
+    Employee.name if column == 'employee_name' else getattr(Entry, column)
+    for column in ENTRY_COLUMNS]
+
+
+class SearchRow(Mapping):
+    """One search result, read and changed like a dict of ENTRY_COLUMNS
+
+    The columns are kept in slots and filled straight from a row tuple,
+    rather than hydrating an Entry and copying it into a dict, so a row
+    takes a fraction of the memory and time to build. row['date'], get,
+    keys, items, dict(row) and comparing with a dict all work as they do
+    on a dict, and row.date reads the same column.
+    """
+    __slots__ = ENTRY_COLUMNS
+
+    def __init__(self, id, employee_name, date, task_name, time_spent,
+                 optional_notes):
+        self.id = id
+        self.employee_name = employee_name
+        self.date = date
+        self.task_name = task_name
+        self.time_spent = time_spent
+        self.optional_notes = optional_notes
+
+    def __getitem__(self, column):
+        if column not in _SEARCH_ROW_COLUMNS:
+            raise KeyError(column)
+        return getattr(self, column)
+
+    def __setitem__(self, column, value):
+        if column not in _SEARCH_ROW_COLUMNS:
+            raise KeyError(column)
+        setattr(self, column, value)
+
+    def __iter__(self):
+        return iter(ENTRY_COLUMNS)
+
+    def __len__(self):
+        return len(ENTRY_COLUMNS)
+
+    def __repr__(self):
+        return 'SearchRow({!r})'.format(dict(self))
+
+    def copy(self):
+        """Return a new SearchRow of the same columns"""
+        return SearchRow(self.id, self.employee_name, self.date,
+                         self.task_name, self.time_spent, self.optional_notes)
+
+
+_SEARCH_ROW_COLUMNS = frozenset(ENTRY_COLUMNS)
+
+
+def _search_rows(query):
+    """Return a list of a SearchRow for each entry query selects
+
+    The rows are read from the cursor as they are, only the date needs
+    converting. The CHECK on entry.date keeps every date YYYY-MM-DD, so
+    fromisoformat can do it rather than peewee trying strptime formats.
+    """
+    query = query.select(*_ENTRY_COLUMN_FIELDS)
+    to_date = datetime.date.fromisoformat
+    with _connection() as database:
+        return [SearchRow(id, employee_name, to_date(date), task_name,
+                          time_spent, optional_notes)
+                for id, employee_name, date, task_name, time_spent,
+                optional_notes in database.execute(query)]
+
+
+class SearchResults:
+    """Search results fetched a page at a time as they are indexed
+
+    Behaves like the list of SearchRows the search functions return (len,
+    indexing and del) but only keeps a window of max_pages pages in
+    memory. Rows are ordered by (date, id) descending, and moving to the
+    page before or after the window seeks from the (date, id) at its edge
+    rather than using OFFSET, so stepping through results costs the same
+    at row 100,000 as at row 1.
+    """
+    def __init__(self, query, page_size=50, max_pages=3):
+        self.query = query
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._count = None
+        self._start = 0
+        self._rows = []
+        self._keys = []
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self._fetch_count()
+        return self._count
+
+    @staticmethod
+    def _cache_key(kind, query):
+        sql, params = query.sql()
+        return ('SearchResults', kind, sql, tuple(params))
+
+    @_timed
+    def _fetch_count(self):
+        def count():
+            with _connection() as database:
+                return [(self.query.bind(database).count(),)]
+        return _through_cache(
+            self._cache_key('count', self.query), count)[0][0]
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def _index(self, index):
+        """Return index as a non-negative position, IndexError if invalid"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('search result index out of range')
+        return index
+
+    @_timed
+    def _fetch_page(self, query):
+        query = query.limit(self.page_size)
+        return _through_cache(self._cache_key('page', query),
+                              lambda: _search_rows(query))
+
+    def _fetch(self, query):
+        """Run query and return its rows and their (date, id) keys"""
+        rows = self._fetch_page(query)
+        keys = [(str(row.date), row.id) for row in rows]
+        return rows, keys
+
+    def _load(self, index):
+        """Bring the page holding index into the window"""
+        key = Tuple(Entry.date, Entry.id)
+        end = self._start + len(self._rows)
+        if self._rows and index == end:
+            rows, keys = self._fetch(self.query.where(
+                key < Tuple(*self._keys[-1])
+            ).order_by(Entry.date.desc(), Entry.id.desc()))
+            self._rows += rows
+            self._keys += keys
+            excess = len(self._rows) - self.page_size * self.max_pages
+            if excess > 0:
+                del self._rows[:excess]
+                del self._keys[:excess]
+                self._start += excess
+        elif self._rows and index == self._start - 1:
+            rows, keys = self._fetch(self.query.where(
+                key > Tuple(*self._keys[0])
+            ).order_by(Entry.date.asc(), Entry.id.asc()))
+            rows.reverse()
+            keys.reverse()
+            self._rows[:0] = rows
+            self._keys[:0] = keys
+            self._start -= len(rows)
+            del self._rows[self.page_size * self.max_pages:]
+            del self._keys[self.page_size * self.max_pages:]
+        else:
+            # A jump away from the window, seek with OFFSET once
+            self._start = index - index % self.page_size
+            self._rows, self._keys = self._fetch(self.query.order_by(
+                Entry.date.desc(), Entry.id.desc()
+            ).offset(self._start))
+
+    def __getitem__(self, index):
+        index = self._index(index)
+        if not self._start <= index < self._start + len(self._rows):
+            self._load(index)
+        return self._rows[index - self._start]
+
+    def __delitem__(self, index):
+        """Forget a row that has been deleted from the database"""
+        index = self._index(index)
+        if self._start <= index < self._start + len(self._rows):
+            del self._rows[index - self._start]
+            del self._keys[index - self._start]
+        elif index < self._start:
+            self._start -= 1
+        self._count -= 1
+
+
+# Whether entry_fts exists, as (connection, exists) by the id() of the
+# connection it was looked up on
+_full_text_indexes = {}
+
+
+@_timed
+def has_full_text_index():
+    """Return True if entry_fts exists in the database searches run on
+
+    The table is looked up once per connection, and again after migrate()
+    has changed the schema, rather than on every exact search.
+    """
+    with _connection() as database:
+        connection = database.connection()
+        known = _full_text_indexes.get(id(connection))
+        if known is not None and known[0] is connection:
+            return known[1]
+        exists = database.table_exists(FTS_TABLE)
+        _forget_closed_connections(_full_text_indexes)
+        _full_text_indexes[id(connection)] = (connection, exists)
+        return exists
+
+
+def _exact_string_condition(exact_string, full_text):
+    """Match exact_string in task_name or optional_notes
+
+    Uses the entry_fts index when it exists and the string is long enough
+    for trigrams, otherwise falls back to scanning with LIKE.
+    """
+    if (full_text and len(exact_string) >= FTS_MIN_LENGTH and
+            has_full_text_index()):
+        # Quote the string as an FTS5 phrase so its characters are literal
+        phrase = '"{}"'.format(exact_string.replace('"', '""'))
+        return Entry.id.in_(SQL(
+            '(SELECT rowid FROM entry_fts WHERE entry_fts MATCH ?)',
+            [phrase]))
+    return (Entry.task_name.contains(exact_string) |
+            Entry.optional_notes.contains(exact_string))
+
+
+# Ways employee_name_search can match a name
+EMPLOYEE_MATCHES = ('prefix', 'substring', 'exact')
+
+
+def _employee_key_condition(employee_name, employee_match):
+    """Match the employees whose names hold employee_name, ignoring case
+    and extra whitespace, at the start (an employee.key index range) or
+    anywhere (a scan of every employee), or the one employee named
+    exactly employee_name
+    """
+    if employee_match not in EMPLOYEE_MATCHES:
+        raise ValueError('employee_match must be one of {}'.format(
+            ', '.join(EMPLOYEE_MATCHES)))
+    if employee_match == 'exact':
+        return Employee.name == employee_name
+    key = normalize_employee_name(employee_name)
+    if employee_match == 'substring':
+        return Employee.key.contains(key)
+    # Every string starting with key sorts between key and key followed
+    # by the largest code point
+    return Employee.key.between(key, key + '\U0010ffff')
+
+
+def _search_conditions(date=None, date_range=None, time_spent=None,
+                       exact_string=None, employee_name=None, full_text=True,
+                       time_spent_range=None, employee_match='prefix'):
+    """Return the conditions on Entry of the criteria of search_query,
+    none of which need employee joined
+    """
+    conditions = []
+    if date is not None:
+        conditions.append(Entry.date == date)
+    if date_range is not None:
+        conditions.append(Entry.date.between(*date_range))
+    if time_spent is not None:
+        conditions.append(
+            Entry.time_spent == normalize_time_spent(time_spent))
+    if time_spent_range is not None:
+        minimum, maximum = time_spent_range
+        if minimum is not None:
+            conditions.append(
+                Entry.time_spent >= normalize_time_spent(minimum))
+        if maximum is not None:
+            conditions.append(
+                Entry.time_spent <= normalize_time_spent(maximum))
+    if exact_string is not None:
+        conditions.append(_exact_string_condition(exact_string, full_text))
+    if employee_name is not None:
+        # Find the employees first, then their entries by employee id
+        conditions.append(Entry.employee.in_(
+            Employee.select(Employee.id).where(
+                _employee_key_condition(employee_name, employee_match))))
+    return conditions
+
+
+def search_query(**criteria):
+    """Return an Entry query matching every criterion that isn't None
+
+    The criteria are date, date_range, time_spent, time_spent_range,
+    exact_string (with full_text) and employee_name (with
+    employee_match), each matching the way the search function of the
+    same name does. date_range is a (first date, last date) pair and
+    time_spent_range a (minimum, maximum) pair of minutes, inclusive,
+    either of which may be None. employee_match is one of
+    EMPLOYEE_MATCHES.
+    """
+    conditions = _search_conditions(**criteria)
+    # The name is read onto each Entry as employee_name, objects() skips
+    # building an Employee for every row
+    query = Entry.select(
+        Entry, Employee.name.alias('employee_name')
+    ).join(Employee).objects()
+    if conditions:
+        query = query.where(*conditions)
+    return query
+
+
+@_timed
+def iter_entries(**criteria):
+    """Yield a tuple of ENTRY_COLUMNS for each entry matching criteria,
+    ordered by date descending
+
+    Rows are read from the cursor as they are consumed and are neither
+    cached by peewee nor hydrated into models, so memory use doesn't grow
+    with the number of matches.  criteria are those of search_query.
+    """
+    query = search_query(**criteria).select(
+        *_ENTRY_COLUMN_FIELDS
+    ).order_by(Entry.date.desc(), Entry.id.desc()).tuples()
+    with _connection() as database:
+        yield from query.bind(database).iterator()
+
+
+# What distinct_values can list, by the name of the search result key
+DISTINCT_FIELDS = {
+    'date': Entry.date,
+    'employee_name': Employee.name,
+}
+
+
+@_timed
+@_cached
+def distinct_values(field, **criteria):
+    """Return a (value, number of entries) pair for each distinct value
+    of field, 'date' or 'employee_name', among the entries matching
+    criteria, in order of value
+
+    The entries are grouped in SQLite, so only one row per value is read
+    however many entries match. criteria are those of search_query.
+    """
+    column = DISTINCT_FIELDS[field]
+    query = Entry.select(column, fn.COUNT(SQL('*')))
+    if field == 'employee_name':
+        query = query.join(Employee)
+    conditions = _search_conditions(**criteria)
+    if conditions:
+        query = query.where(*conditions)
+    query = query.group_by(column).order_by(column).tuples()
+    with _connection() as database:
+        return list(query.bind(database))
+
+
+def _search(query, lazy):
+    """Return the results of a search query ordered by date descending"""
+    if lazy:
+        return SearchResults(query)
+    return _search_rows(query.order_by(Entry.date.desc(), Entry.id.desc()))
+
+
+@_timed
+@_cached
+def exact_date_search(date, lazy=False):
     """Search database by exact date"""
-    entries = Entry.select().where(Entry.date.contains(date))
-    matches = []
-    for entry in entries:
-        matches.append({
-                'employee_name': entry.employee_name,
-                'date': entry.date,
-                'task_name': entry.task_name,
-                'time_spent': entry.time_spent,
-                'optional_notes': entry.optional_notes
-            })
-    return matches
+    return _search(search_query(date=date), lazy)
 
 
-def date_range_search(date, date_2):
+@_timed
+@_cached
+def date_range_search(date, date_2, lazy=False):
     """Search database by range of dates"""
-    entries = Entry.select().where(
-        Entry.date.between(date, date_2)).order_by(Entry.date.desc())
-    matches = []
-    for entry in entries:
-        matches.append({
-                'employee_name': entry.employee_name,
-                'date': entry.date,
-                'task_name': entry.task_name,
-                'time_spent': entry.time_spent,
-                'optional_notes': entry.optional_notes
-            })
-    return matches
+    return _search(search_query(date_range=(date, date_2)), lazy)
 
 
-def time_spent_search(time_spent):
+@_timed
+@_cached
+def time_spent_search(time_spent, lazy=False):
     """Search database by time spent"""
-    entries = Entry.select().where(Entry.time_spent == time_spent).order_by(
-        Entry.date.desc()
-    )
-    matches = []
-    for entry in entries:
-        matches.append({
-                'employee_name': entry.employee_name,
-                'date': entry.date,
-                'task_name': entry.task_name,
-                'time_spent': entry.time_spent,
-                'optional_notes': entry.optional_notes
-            })
-    return matches
-
-
-def exact_search(exact_string):
-    """Search database task_name and optional_notes fields by exact string"""
-    entries = Entry.select().where(
-        Entry.task_name.contains(
-            exact_string) | Entry.optional_notes.contains(exact_string)
-            ).order_by(Entry.date.desc())
-    matches = []
-    for entry in entries:
-        matches.append({
-                'employee_name': entry.employee_name,
-                'date': entry.date,
-                'task_name': entry.task_name,
-                'time_spent': entry.time_spent,
-                'optional_notes': entry.optional_notes
-            })
-    return matches
-
-
-def employee_name_search(employee_name):
-    """Searches database by employee name"""
-    entries = Entry.select().where(
-        Entry.employee_name.contains(employee_name)
-    ).order_by(Entry.date.desc())
-    matches = []
-    for entry in entries:
-        matches.append({
-                'employee_name': entry.employee_name,
-                'date': entry.date,
-                'task_name': entry.task_name,
-                'time_spent': entry.time_spent,
-                'optional_notes': entry.optional_notes
-            })
-    return matches
+    return _search(search_query(time_spent=time_spent), lazy)
+
+
+@_timed
+@_cached
+def time_spent_range_search(minimum=None, maximum=None, lazy=False):
+    """Search database by a range of time spent, None for no bound"""
+    return _search(
+        search_query(time_spent_range=(minimum, maximum)), lazy)
+
+
+@_timed
+@_cached
+def exact_search(exact_string, full_text=True, lazy=False):
+    """Search database task_name and optional_notes fields by exact string
+
+    Uses the entry_fts index when it exists and the string is long enough
+    for trigrams, otherwise falls back to scanning with LIKE.
+    """
+    return _search(
+        search_query(exact_string=exact_string, full_text=full_text), lazy)
+
+
+_employee_search_stats = threading.local()
+
+
+@_timed
+@_cached
+def employee_name_search(employee_name, mode='prefix', lazy=False):
+    """Searches database by employee name, ignoring case and extra
+    whitespace
+
+    mode 'prefix' matches names starting with employee_name using the
+    employee.key index, 'substring' matches it anywhere in the name by
+    scanning every employee and 'exact' only the name employee_name, as
+    stored. employee_search_stats() tells how it went.
+    """
+    results = _search(search_query(
+        employee_name=employee_name, employee_match=mode), lazy)
+    # Counted when employee_search_stats() asks, lazy results count then
+    _employee_search_stats.last = (
+        employee_name, mode, results if lazy else len(results))
+    return results
+
+
+def employee_search_stats():
+    """Return the mode, number of matches and estimated number of rows
+    examined of this thread's last employee_name_search run against the
+    database (not answered from the search cache), or None if there
+    wasn't one
+
+    The estimate is worked out from the plan, not measured: the
+    employees read to find the matching names, only those names for a
+    prefix or exact search and every employee for a substring search,
+    plus the matching entries. The employees are counted now, by an
+    extra query, so adds since the search change it.
+    """
+    last = getattr(_employee_search_stats, 'last', None)
+    if last is None:
+        return None
+    employee_name, mode, matches = last
+    if not isinstance(matches, int):
+        matches = len(matches)
+    employees = Employee.select()
+    if mode != 'substring':
+        employees = employees.where(
+            _employee_key_condition(employee_name, mode))
+    with _connection() as database:
+        employees = employees.bind(database).count()
+    return {
+        'mode': mode,
+        'matches': matches,
+        'estimated_rows_examined': employees + matches,
+    }
+
+
+# SQL expressions giving the first day of the period holding a date
+PERIODS = {
+    'day': lambda date: date,
+    'week': lambda date: fn.date(date, '-6 days', 'weekday 1'),
+    'month': lambda date: fn.strftime('%Y-%m-01', date),
+}
+
+
+@_timed
+def time_totals(first_date, last_date, employee_name=None, period='day'):
+    """Return the minutes and number of entries logged per employee per
+    period between first_date and last_date inclusive
+
+    period is 'day', 'week' (starting Monday), 'month' or None for the
+    whole range. Each result is a dict of employee_name, period (the first
+    day of the period, None for the whole range), total_minutes and
+    entries, ordered by period then name. The totals are read from
+    daily_total, or summed from entry if it hasn't been migrated yet.
+    """
+    with _connection() as database:
+        summarized = database.table_exists(DailyTotal._meta.table_name)
+    if summarized:
+        model = DailyTotal
+        name = DailyTotal.employee_name
+        minutes = fn.SUM(DailyTotal.total_minutes)
+        entries = fn.SUM(DailyTotal.entries)
+    else:
+        model = Entry
+        name = Employee.name
+        minutes = fn.SUM(Entry.time_spent)
+        entries = fn.COUNT(Entry.id)
+
+    columns = [name.alias('employee_name'), minutes.alias('total_minutes'),
+               entries.alias('entries')]
+    group_by = [name]
+    if period is not None:
+        start = PERIODS[period](model.date)
+        columns.append(start.alias('period'))
+        group_by.insert(0, start)
+    query = model.select(*columns)
+    if not summarized:
+        query = query.join(Employee)
+    query = query.where(model.date.between(first_date, last_date))
+    if employee_name is not None:
+        query = query.where(name == employee_name)
+    query = query.group_by(*group_by).order_by(*group_by).dicts()
+
+    totals = []
+    with _connection() as database:
+        rows = list(query.bind(database))
+    for row in rows:
+        start = row.get('period')
+        totals.append({
+            'employee_name': row['employee_name'],
+            'period': None if start is None else datetime.date(
+                *map(int, str(start).split('-'))),
+            'total_minutes': row['total_minutes'],
+            'entries': row['entries'],
+        })
+    return totals
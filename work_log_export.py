@@ -0,0 +1,131 @@
+"""
+Streaming export of work log entries to CSV or JSONL
+
+Entries matching the given search criteria are written as they are read
+from the database, so memory use stays flat however many entries match.
+
+    python3 work_log_export.py --range 2019/03/01 2019/03/31 -o march.csv.gz
+"""
+import argparse
+import contextlib
+import csv
+import gzip
+import io
+import json
+import sys
+import work_log
+import work_log_db
+
+
+def write_csv(rows, output):
+    """Write rows as CSV with a header line, returns the number written"""
+    writer = csv.writer(output)
+    writer.writerow(work_log_db.ENTRY_COLUMNS)
+    count = 0
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+    return count
+
+
+def write_jsonl(rows, output):
+    """Write rows as one JSON object per line, returns the number written"""
+    count = 0
+    for count, row in enumerate(rows, 1):
+        entry = dict(zip(work_log_db.ENTRY_COLUMNS, row))
+        entry['date'] = str(entry['date'])
+        output.write(json.dumps(entry))
+        output.write('\n')
+    return count
+
+
+WRITERS = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+}
+
+
+def export_entries(output, file_format='csv', **criteria):
+    """Write the entries matching criteria to output, a text file, and
+    return the number written
+
+    criteria are those of work_log_db.search_query.
+    """
+    return WRITERS[file_format](work_log_db.iter_entries(**criteria), output)
+
+
+@contextlib.contextmanager
+def open_output(path, compress):
+    """Open path, or stdout for '-', as a text file, gzipped if compress"""
+    if path != '-':
+        if compress:
+            output = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        else:
+            output = open(path, 'w', encoding='utf-8', newline='')
+        with output:
+            yield output
+        return
+
+    binary = sys.stdout.buffer
+    stream = gzip.GzipFile(fileobj=binary, mode='wb') if compress else binary
+    output = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    try:
+        yield output
+    finally:
+        # Closing the wrapper would close stdout, a GzipFile has to be
+        # closed to write its trailer but leaves stdout open
+        output.flush()
+        output.detach()
+        if compress:
+            stream.close()
+        binary.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Export work log entries matching every given criterion')
+    parser.add_argument('--date', type=work_log.parse_date,
+                        help='exact date, YYYY/MM/DD')
+    parser.add_argument('--range', nargs=2, type=work_log.parse_date,
+                        metavar=('FIRST', 'LAST'),
+                        help='range of dates, YYYY/MM/DD YYYY/MM/DD')
+    parser.add_argument('--employee',
+                        help='employee name starts with, ignoring case')
+    parser.add_argument('--employee-match', default='prefix',
+                        choices=work_log_db.EMPLOYEE_MATCHES,
+                        help='match --employee at the start of the name '
+                             '(default), anywhere in it or the whole name')
+    parser.add_argument('--term',
+                        help='task name or optional notes contain')
+    parser.add_argument('--minutes', type=work_log.parse_time_spent_range,
+                        help='time spent in minutes, a range like 60-240 '
+                             'or a threshold like >480')
+    parser.add_argument('--format', choices=sorted(WRITERS),
+                        help='output format, guessed from the output '
+                             'file name by default (csv)')
+    parser.add_argument('--gzip', action='store_true',
+                        help='gzip the output, implied by a .gz file name')
+    parser.add_argument('-o', '--output', default='-',
+                        help="file to write, '-' for stdout (default)")
+    args = parser.parse_args(argv)
+
+    name = args.output[:-3] if args.output.endswith('.gz') else args.output
+    file_format = args.format or (
+        'jsonl' if name.endswith(('.jsonl', '.json')) else 'csv')
+    compress = args.gzip or args.output.endswith('.gz')
+
+    work_log_db.initialize()
+    with open_output(args.output, compress) as output:
+        count = export_entries(
+            output, file_format,
+            date=args.date,
+            date_range=args.range,
+            employee_name=args.employee,
+            employee_match=args.employee_match,
+            exact_string=args.term,
+            time_spent_range=args.minutes)
+    print('Exported {:,} entries'.format(count), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Bulk import of work log entries from CSV or JSONL files
+
+Each CSV row or JSON line holds employee_name, date (YYYY/MM/DD or
+YYYY-MM-DD), task_name, time_spent and optionally optional_notes.  Rows are
+checked with the same rules as the prompts in work_log.py, valid rows are
+inserted in batches and invalid ones are reported by line number.
+
+    python3 work_log_import.py timesheets.csv --batch-size 5000
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+import work_log
+import work_log_db
+
+
+class ImportReport:
+    """Counts and timing of an import"""
+    def __init__(self):
+        self.imported = 0
+        self.rejected = []
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        if not self.seconds:
+            return 0.0
+        return self.imported / self.seconds
+
+
+def read_csv(lines):
+    """Yield (line number, row dict) for each row of a CSV file with a
+    header line
+    """
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(lines):
+    """Yield (line number, row dict) for each non-blank line of a JSONL
+    file, rows that aren't valid JSON objects are yielded as the error
+    """
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            row = error
+        else:
+            if not isinstance(row, dict):
+                row = ValueError('expected a JSON object')
+        yield line_number, row
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def validate_row(row):
+    """Return a log entry dict for row, ValueError if a field is invalid"""
+    if isinstance(row, Exception):
+        raise ValueError(row)
+    fields = {}
+    for field in ['employee_name', 'date', 'task_name', 'time_spent']:
+        if row.get(field) in (None, ''):
+            raise ValueError('{} is missing'.format(field))
+        fields[field] = str(row[field])
+    try:
+        date = work_log.parse_date(fields['date'].replace('-', '/'))
+    except ValueError:
+        raise ValueError(
+            "{} doesn't seem to be a valid date".format(fields['date']))
+    notes = row.get('optional_notes')
+    return {
+        'employee_name': work_log.validate_employee_name(
+            fields['employee_name']),
+        'date': date,
+        'task_name': work_log.validate_task_name(fields['task_name']),
+        'time_spent': work_log.parse_time_spent(fields['time_spent']),
+        'optional_notes': '' if notes is None else str(notes),
+    }
+
+
+def import_entries(lines, file_format, batch_size=1000):
+    """Import the entries in lines, an iterable of CSV or JSONL text lines,
+    and return an ImportReport
+    """
+    report = ImportReport()
+
+    def valid_entries():
+        for line_number, row in READERS[file_format](lines):
+            try:
+                yield validate_row(row)
+            except ValueError as error:
+                report.rejected.append((line_number, str(error)))
+
+    start = time.perf_counter()
+    report.imported = work_log_db.add_entries(valid_entries(), batch_size)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Import work log entries from a CSV or JSONL file')
+    parser.add_argument('path', help="file to import, '-' for stdin")
+    parser.add_argument(
+        '--format', choices=sorted(READERS),
+        help='file format, guessed from the extension by default')
+    parser.add_argument(
+        '--batch-size', type=int, default=1000,
+        help='entries committed per transaction (default 1000)')
+    parser.add_argument(
+        '--profile', choices=sorted(work_log_db.PRAGMA_PROFILES),
+        help='SQLite pragma profile to import with, e.g. bulk-load')
+    args = parser.parse_args(argv)
+
+    file_format = args.format
+    if file_format is None:
+        file_format = 'jsonl' if args.path.endswith(
+            ('.jsonl', '.json')) else 'csv'
+
+    if args.profile:
+        work_log_db.configure(profile=args.profile)
+    work_log_db.initialize()
+    if args.path == '-':
+        report = import_entries(sys.stdin, file_format, args.batch_size)
+    else:
+        with open(args.path, newline='', encoding='utf-8') as lines:
+            report = import_entries(lines, file_format, args.batch_size)
+
+    for line_number, error in report.rejected:
+        print('Line {}: {}'.format(line_number, error), file=sys.stderr)
+    print('Imported {:,} entries in {:.2f}s ({:,.0f} rows/sec), '
+          'rejected {:,}'.format(report.imported, report.seconds,
+                                 report.rows_per_second,
+                                 len(report.rejected)))
+    return 1 if report.rejected else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
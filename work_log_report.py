@@ -0,0 +1,53 @@
+"""
+Time spent reports from the daily_total summary table
+
+    python3 work_log_report.py 2019/03/01 2019/03/31 --by week
+    python3 work_log_report.py --rebuild
+"""
+import argparse
+import sys
+import work_log
+import work_log_db
+
+
+def format_totals(totals):
+    """Return report lines for the results of work_log_db.time_totals"""
+    lines = ['{:<12}{:<52}{:>10}{:>9}'.format(
+        'period', 'employee', 'minutes', 'entries')]
+    for total in totals:
+        lines.append('{:<12}{:<52}{:>10,}{:>9,}'.format(
+            str(total['period'] or 'total'), total['employee_name'],
+            total['total_minutes'], total['entries']))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Report minutes logged per employee per period')
+    parser.add_argument('first', nargs='?', type=work_log.parse_date,
+                        help='first date, YYYY/MM/DD')
+    parser.add_argument('last', nargs='?', type=work_log.parse_date,
+                        help='last date, YYYY/MM/DD')
+    parser.add_argument('--employee', help='only this employee')
+    parser.add_argument('--by', choices=['day', 'week', 'month', 'total'],
+                        default='day', help='period to total by')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='recompute the summary table from every entry')
+    args = parser.parse_args(argv)
+    if not args.rebuild and (args.first is None or args.last is None):
+        parser.error('first and last dates are required')
+
+    work_log_db.initialize()
+    if args.rebuild:
+        rows = work_log_db.rebuild_daily_totals()
+        print('Rebuilt {:,} daily totals'.format(rows), file=sys.stderr)
+    if args.first is not None and args.last is not None:
+        period = None if args.by == 'total' else args.by
+        totals = work_log_db.time_totals(
+            args.first, args.last, args.employee, period)
+        print('\n'.join(format_totals(totals)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+JSON HTTP API for the work log, for many users sharing one database
+
+    python3 work_log_server.py --port 8080 --workers 16 --idle-timeout 5
+
+    POST   /entries                 add the entry in the request body
+    GET    /entries/<id>            the entry with id
+    PUT    /entries/<id>            change the fields given in the body
+    DELETE /entries/<id>            delete the entry with id
+    GET    /search/exact_date?date=2019-03-20
+    GET    /search/date_range?first=2019-03-01&last=2019-03-31
+    GET    /search/time_spent?minutes=30
+    GET    /search/time_spent_range?minutes=60-240   (or >480, <=30)
+    GET    /search/exact?term=report
+    GET    /search/employee_name?name=John
+
+Entries are JSON objects with the fields of work_log_import.validate_row
+plus id. Searches return {"entries": [...], "page": 1, "per_page": 50,
+"total": 123}, newest first, a page of per_page (at most MAX_PER_PAGE)
+entries at a time. Errors are {"error": message} with a 4xx status, or
+500 if the database failed.
+Connections are kept alive, each is served by one of the worker threads
+for as long as it stays open, or until it has been idle for
+WorkLogHandler.timeout (--idle-timeout) seconds. A connection holds its
+worker while idle, so with more open connections than --workers the
+others wait up to that long for a worker; keep the timeout short.
+"""
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+import work_log
+import work_log_db
+import work_log_import
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 500
+
+
+def parse_date(value):
+    """Return a YYYY-MM-DD or YYYY/MM/DD date, ValueError if invalid"""
+    try:
+        return work_log.parse_date(value.replace('-', '/'))
+    except ValueError:
+        raise ValueError("{} doesn't seem to be a valid date".format(value))
+
+
+def time_spent_range_search(minutes, lazy=False):
+    """Search by the (minimum, maximum) minutes of parse_time_spent_range"""
+    return work_log_db.time_spent_range_search(*minutes, lazy=lazy)
+
+
+# Search name: (search function, [(query parameter, parser)])
+SEARCHES = {
+    'exact_date': (work_log_db.exact_date_search, [('date', parse_date)]),
+    'date_range': (work_log_db.date_range_search,
+                   [('first', parse_date), ('last', parse_date)]),
+    'time_spent': (work_log_db.time_spent_search,
+                   [('minutes', work_log.parse_time_spent)]),
+    'time_spent_range': (time_spent_range_search,
+                         [('minutes', work_log.parse_time_spent_range)]),
+    'exact': (work_log_db.exact_search, [('term', str)]),
+    'employee_name': (work_log_db.employee_name_search, [('name', str)]),
+}
+
+
+def _json_default(value):
+    """Encode search result rows as objects and dates as strings"""
+    if isinstance(value, work_log_db.SearchRow):
+        return dict(value)
+    return str(value)
+
+
+class NotFound(Exception):
+    """Raised for paths and entries that don't exist"""
+
+
+def _positive_int(parameters, name, default):
+    """Return the query parameter name as a positive int"""
+    value = parameters.get(name, [str(default)])[0]
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise ValueError('{} must be a positive integer'.format(name))
+    return number
+
+
+def search(name, parameters):
+    """Run the search name with query parameters, returns a page of it"""
+    if name not in SEARCHES:
+        raise NotFound('No search named {}'.format(name))
+    function, arguments = SEARCHES[name]
+    values = []
+    for parameter, parser in arguments:
+        if not parameters.get(parameter):
+            raise ValueError('{} is missing'.format(parameter))
+        values.append(parser(parameters[parameter][0]))
+    if name == 'date_range' and values[0] > values[1]:
+        raise ValueError('{} is greater than {}'.format(*values))
+
+    page = _positive_int(parameters, 'page', 1)
+    per_page = min(
+        _positive_int(parameters, 'per_page', DEFAULT_PER_PAGE), MAX_PER_PAGE)
+    results = function(*values, lazy=True)
+    total = len(results)
+    first = (page - 1) * per_page
+    return {
+        'entries': [results[index]
+                    for index in range(first, min(first + per_page, total))],
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+    }
+
+
+def _entry(entry_id):
+    """Return the entry with entry_id, NotFound if there isn't one"""
+    entry = work_log_db.get_entry(entry_id)
+    if entry is None:
+        raise NotFound('No entry with id {}'.format(entry_id))
+    return entry
+
+
+class WorkLogHandler(BaseHTTPRequestHandler):
+    """Routes requests to work_log_db and answers with JSON"""
+    # HTTP/1.1 keeps connections open between requests
+    protocol_version = 'HTTP/1.1'
+    # The headers and body are separate writes, without TCP_NODELAY the
+    # body waits for the client's delayed ACK of the headers
+    disable_nagle_algorithm = True
+    # Seconds an idle kept alive connection holds on to its worker
+    timeout = 5
+    server_version = 'WorkLog/1.0'
+    quiet = False
+
+    def _send(self, status, body):
+        data = json.dumps(body, default=_json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        """Return the request body as a JSON object"""
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError:
+            raise ValueError('The request body must be JSON')
+        if not isinstance(body, dict):
+            raise ValueError('The request body must be a JSON object')
+        return body
+
+    def _entry_id(self, parts):
+        """Return the id of an /entries/<id> path, NotFound otherwise"""
+        if len(parts) != 2 or parts[0] != 'entries' or not parts[1].isdigit():
+            raise NotFound('No such path {}'.format(self.path))
+        return int(parts[1])
+
+    def _handle(self, method):
+        """Answer the request with the result of method(path parts, query
+        parameters), a (status, body) pair
+        """
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            status, body = method(parts, parse_qs(url.query))
+        except NotFound as error:
+            status, body = HTTPStatus.NOT_FOUND, {'error': str(error)}
+        except ValueError as error:
+            status, body = HTTPStatus.BAD_REQUEST, {'error': str(error)}
+        except Exception as error:
+            # Answer rather than drop the kept alive connection
+            self.log_error('%s: %s', type(error).__name__, error)
+            status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {
+                'error': str(error)}
+        self._send(status, body)
+
+    def _get(self, parts, parameters):
+        if len(parts) == 2 and parts[0] == 'search':
+            return HTTPStatus.OK, search(parts[1], parameters)
+        return HTTPStatus.OK, _entry(self._entry_id(parts))
+
+    def _post(self, parts, parameters):
+        if parts != ['entries']:
+            raise NotFound('No such path {}'.format(self.path))
+        entry = work_log_db.add_entry(
+            work_log_import.validate_row(self._read_json()))
+        return HTTPStatus.CREATED, entry
+
+    def _put(self, parts, parameters):
+        entry = _entry(self._entry_id(parts))
+        modification = dict(entry)
+        modification.update(self._read_json())
+        modification = work_log_import.validate_row(modification)
+        work_log_db.edit_entry(entry, modification)
+        return HTTPStatus.OK, dict(modification, id=entry['id'])
+
+    def _delete(self, parts, parameters):
+        return HTTPStatus.OK, work_log_db.delete_entry(
+            _entry(self._entry_id(parts)))
+
+    def do_GET(self):
+        self._handle(self._get)
+
+    def do_POST(self):
+        self._handle(self._post)
+
+    def do_PUT(self):
+        self._handle(self._put)
+
+    def do_DELETE(self):
+        self._handle(self._delete)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class WorkerPoolHTTPServer(HTTPServer):
+    """An HTTPServer serving each connection on a fixed pool of threads
+
+    Unlike ThreadingHTTPServer the number of threads, and so of database
+    connections, is bounded. Connections beyond workers wait their turn.
+    """
+    def __init__(self, address, handler, workers=8):
+        super().__init__(address, handler)
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='work_log_server')
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(
+            self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False)
+
+
+def make_server(host='127.0.0.1', port=8080, workers=8):
+    """Return a server for the work log API, serve it with serve_forever()
+
+    work_log_db should be set up with configure_pool() first so the
+    workers can use the database at the same time.
+    """
+    return WorkerPoolHTTPServer((host, port), WorkLogHandler, workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Serve the work log as a JSON HTTP API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=8,
+                        help='threads serving connections, and the size of '
+                             'the database reader pool (default 8); each '
+                             'open connection keeps one until it has been '
+                             'idle for --idle-timeout')
+    parser.add_argument('--idle-timeout', type=float, default=5,
+                        metavar='SECONDS',
+                        help='close kept alive connections idle for SECONDS '
+                             '(default 5)')
+    parser.add_argument('--profile', default='fast',
+                        choices=sorted(work_log_db.PRAGMA_PROFILES),
+                        help='connection settings (default fast, WAL)')
+    parser.add_argument('--group-commit', action='store_true',
+                        help='commit the adds of concurrent requests '
+                             'together, see work_log_db.GroupCommitWriter')
+    parser.add_argument('--slow-queries', type=float, metavar='SECONDS',
+                        help='log database calls taking at least SECONDS, '
+                             'with their query plans, to stderr')
+    parser.add_argument('--quiet', action='store_true',
+                        help="don't log each request")
+    args = parser.parse_args(argv)
+
+    work_log_db.configure_pool(
+        profile=args.profile, max_connections=args.workers)
+    if args.group_commit:
+        work_log_db.enable_group_commit()
+    if args.slow_queries is not None:
+        work_log_db.enable_query_timing(args.slow_queries, sys.stderr)
+    WorkLogHandler.quiet = args.quiet
+    WorkLogHandler.timeout = args.idle_timeout
+    server = make_server(args.host, args.port, args.workers)
+    print('Serving on http://{}:{}/'.format(*server.server_address[:2]),
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        work_log_db.disable_group_commit()
+        work_log_db.disable_query_timing()
+        work_log_db.disable_pool()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())